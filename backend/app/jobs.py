@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread, local
+from typing import Callable, Dict, Optional
+
+from .database import SessionLocal
+from .models import Job
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+_current = local()
+
+
+def current_job() -> Optional["JobContext"]:
+    """
+    The context of the job running in this thread, if any, for code called from a
+    handler (Portia step hooks, long-running tools) to check whether to stop.
+    """
+    return getattr(_current, "context", None)
+
+
+class JobContext:
+    """
+    Handed to a job handler: report progress, and check whether to stop.
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: str):
+        self.runner = runner
+        self.job_id = job_id
+        self.cancelled = Event()
+
+    def progress(self, message: str) -> None:
+        """
+        Record what the job is doing. Raises JobCancelled once the job was cancelled or
+        timed out, so a handler stops at its next progress() (or check()) call.
+        """
+        self.check()
+        self.runner._update(self.job_id, progress=message)
+
+    def check(self) -> None:
+        if self.cancelled.is_set():
+            raise JobCancelled(self.job_id)
+
+
+class JobRunner:
+    """
+    Runs registered handlers in a bounded thread pool per job kind, with each job's
+    state, progress and result kept in the jobs table.
+
+    Jobs past their timeout, or cancelled while running, are marked so right away and
+    their handler is told to stop: progress() and check() raise JobCancelled, and code
+    the handler calls finds the job's context with current_job() (the Portia runtime
+    checks it before every plan step). Until the handler gets there it keeps its
+    worker, and whatever it returns is discarded. Each kind has its own workers, so
+    slow or stuck jobs of one kind never hold up the others.
+
+    At most queue_size jobs of a kind wait for a worker; submit() raises JobQueueFull
+    beyond that.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, default_timeout: Optional[float] = None, queue_size: Optional[int] = None, session_factory=SessionLocal):
+        self.max_workers = max_workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.default_timeout = default_timeout or float(os.getenv("JOB_TIMEOUT", "900"))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("JOB_QUEUE_SIZE", "100"))
+        self.session_factory = session_factory
+        self._handlers: Dict[str, Callable] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._workers: Dict[str, int] = {}
+        self._lock = Lock()
+        self._futures: Dict[str, Future] = {}
+        self._kinds: Dict[str, str] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._watchdog = None
+
+    def register(self, kind: str, handler: Callable[[dict, JobContext], dict], max_workers: Optional[int] = None) -> None:
+        """
+        handler(payload, context) runs a job of this kind and returns its JSON result,
+        on max_workers (JOB_WORKERS by default) workers of its own.
+        """
+        self._handlers[kind] = handler
+        self._workers[kind] = max_workers or self.max_workers
+        self._executors[kind] = ThreadPoolExecutor(max_workers=self._workers[kind], thread_name_prefix=f"job-{kind}")
+
+    def _update(self, job_id: str, only_if: Optional[tuple] = None, **columns) -> bool:
+        """
+        Set columns of a job, only while its status is in only_if if given. Returns
+        whether the row was updated.
+        """
+        with self.session_factory() as db:
+            query = db.query(Job).filter(Job.id == job_id)
+            if only_if is not None:
+                query = query.filter(Job.status.in_(only_if))
+            updated = query.update(columns, synchronize_session=False)
+            db.commit()
+        return bool(updated)
+
+    def submit(self, kind: str, payload: dict, timeout: Optional[float] = None) -> str:
+        if kind not in self._handlers:
+            raise KeyError(f"No handler for jobs of kind {kind}")
+        executor = self._executors[kind]
+        with self._lock:
+            # Cancelled jobs still stuck in their handler hold a worker too
+            pending = sum(1 for other in self._kinds.values() if other == kind)
+            if pending >= self._workers[kind] + self.queue_size:
+                raise JobQueueFull(f"{pending} {kind} jobs already queued or running")
+        job_id = str(uuid.uuid4())
+        timeout = timeout or self.default_timeout
+        with self.session_factory() as db:
+            db.add(Job(id=job_id, kind=kind, status=QUEUED, payload=json.dumps(payload), timeout=timeout, created_at=time.time()))
+            db.commit()
+        context = JobContext(self, job_id)
+        with self._lock:
+            self._contexts[job_id] = context
+            self._kinds[job_id] = kind
+            self._futures[job_id] = executor.submit(self._run, job_id, kind, payload, context, timeout)
+        self._ensure_watchdog()
+        return job_id
+
+    def _run(self, job_id: str, kind: str, payload: dict, context: JobContext, timeout: float):
+        try:
+            if context.cancelled.is_set() or not self._update(job_id, only_if=(QUEUED,), status=RUNNING, started_at=time.time()):
+                return
+            with self._lock:
+                self._deadlines[job_id] = time.monotonic() + timeout
+            _current.context = context
+            result = self._handlers[kind](payload, context)
+        except JobCancelled:
+            # Already marked unless the flag came from shutdown()
+            self._update(job_id, only_if=(RUNNING,), status=CANCELLED, finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, only_if=(RUNNING,), status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        else:
+            self._update(job_id, only_if=(RUNNING,), status=SUCCEEDED, result=json.dumps(result), finished_at=time.time())
+        finally:
+            _current.context = None
+            self._forget(job_id)
+
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._deadlines.pop(job_id, None)
+            self._contexts.pop(job_id, None)
+            self._futures.pop(job_id, None)
+            self._kinds.pop(job_id, None)
+
+    def _ensure_watchdog(self) -> None:
+        with self._lock:
+            if self._watchdog is None or not self._watchdog.is_alive():
+                self._watchdog = Thread(target=self._watch_timeouts, name="job-watchdog", daemon=True)
+                self._watchdog.start()
+
+    def _watch_timeouts(self) -> None:
+        while True:
+            time.sleep(1.0)
+            now = time.monotonic()
+            with self._lock:
+                expired = [job_id for job_id, deadline in self._deadlines.items() if deadline <= now]
+                for job_id in expired:
+                    del self._deadlines[job_id]
+                contexts = [self._contexts.get(job_id) for job_id in expired]
+            for job_id, context in zip(expired, contexts, strict=True):
+                self._update(job_id, only_if=(RUNNING,), status=TIMED_OUT, error="Timed out", finished_at=time.time())
+                # Only now, so whoever sees the flag also sees the final status
+                if context is not None:
+                    context.cancelled.set()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job. Returns False if it had already finished.
+        """
+        with self._lock:
+            context = self._contexts.get(job_id)
+            future = self._futures.get(job_id)
+        cancelled = self._update(job_id, only_if=(QUEUED, RUNNING), status=CANCELLED, finished_at=time.time())
+        # After the update, so whoever sees the flag also sees the final status
+        if context is not None:
+            context.cancelled.set()
+        if future is not None and future.cancel():
+            # Never started, so _run will not clean up after it
+            self._forget(job_id)
+        return cancelled
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.session_factory() as db:
+            job = db.get(Job, job_id)
+            return _job_dict(job) if job is not None else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> list:
+        with self.session_factory() as db:
+            query = db.query(Job)
+            if status:
+                query = query.filter(Job.status == status)
+            return [_job_dict(job) for job in query.order_by(Job.created_at.desc()).limit(limit).all()]
+
+    async def wait(self, job_id: str) -> dict:
+        """
+        Wait, without blocking the event loop, for a job to finish; returns get(job_id).
+        A job cancelled or timed out counts as finished even while its handler is still
+        stuck in a call.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            context = self._contexts.get(job_id)
+        if future is not None:
+            done = asyncio.wrap_future(future)
+            while not done.done() and not (context is not None and context.cancelled.is_set()):
+                await asyncio.wait({done}, timeout=1.0)
+        job = await asyncio.to_thread(self.get, job_id)
+        while job is not None and job["status"] not in FINISHED:
+            # Flag set by shutdown() without a final status, or the handler is just finishing
+            await asyncio.sleep(0.1)
+            job = await asyncio.to_thread(self.get, job_id)
+        return job
+
+    def recover(self) -> int:
+        """
+        Fail jobs a previous process left queued or running. Returns how many.
+        """
+        with self.session_factory() as db:
+            count = db.query(Job).filter(Job.status.in_((QUEUED, RUNNING))).update(
+                {"status": FAILED, "error": "Interrupted by a restart", "finished_at": time.time()},
+                synchronize_session=False,
+            )
+            db.commit()
+        return count
+
+    def shutdown(self) -> None:
+        with self._lock:
+            contexts = list(self._contexts.values())
+            futures = list(self._futures.items())
+        for context in contexts:
+            context.cancelled.set()
+        for job_id, future in futures:
+            if future.cancel():
+                # Never started, so nothing else gives it a final status
+                self._update(job_id, only_if=(QUEUED,), status=CANCELLED, finished_at=time.time())
+                self._forget(job_id)
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_dict(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+job_runner = JobRunner()
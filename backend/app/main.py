@@ -2,6 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .database import init_db
 from . import repos
+from .jobs import job_runner
+from .portia_impl.aws_actions import AWSClientManager, LogWatcherManager
+from .portia_impl.main import runtime
 
 app = FastAPI()
 
@@ -10,6 +13,17 @@ app = FastAPI()
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    job_runner.recover()
+    # Portia, storage and the GitHub / AWS clients, reused by every plan request
+    runtime.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    job_runner.shutdown()
+    LogWatcherManager.stop()
+    # Error signatures and log checkpoints are written in batches; keep the last ones
+    AWSClientManager.save()
 
 
 # Add CORS middleware
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Boolean, Column, Float, Integer, String, Text
 from .database import Base
 
 
@@ -7,4 +7,50 @@ class Repo(Base):
 
     username = Column(String)
     id = Column(String, primary_key=True)
-    full_name = Column(String)
\ No newline at end of file
+    full_name = Column(String)
+
+class StoredPlan(Base):
+    """
+    Local copy of a Portia plan (see portia_impl.local_storage).
+    """
+    __tablename__ = "portia_plans"
+
+    id = Column(String, primary_key=True)
+    data = Column(Text)
+    version = Column(Integer, default=1)
+    synced = Column(Boolean, default=False, index=True)
+    updated_at = Column(Float)
+
+
+class StoredPlanRun(Base):
+    """
+    Local copy of a Portia plan run (see portia_impl.local_storage).
+    """
+    __tablename__ = "portia_plan_runs"
+
+    id = Column(String, primary_key=True)
+    plan_id = Column(String, index=True)
+    state = Column(String, index=True)
+    data = Column(Text)
+    version = Column(Integer, default=1)
+    synced = Column(Boolean, default=False, index=True)
+    updated_at = Column(Float, index=True)
+
+
+class Job(Base):
+    """
+    A unit of background work (see app.jobs).
+    """
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, index=True)
+    status = Column(String, index=True)
+    progress = Column(String)
+    payload = Column(Text)
+    result = Column(Text)
+    error = Column(Text)
+    timeout = Column(Float)
+    created_at = Column(Float, index=True)
+    started_at = Column(Float)
+    finished_at = Column(Float)
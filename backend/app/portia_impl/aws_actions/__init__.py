@@ -1,2 +1,9 @@
 from .aws_client import *
 from .aws_tools import *
+from .error_classifier import *
+from .fake_logs import *
+from .fingerprint import *
+from .log_checkpoints import *
+from .log_watcher import *
+from .pipeline import *
+from .reassembly import *
@@ -1,19 +1,70 @@
 import boto3
+import hashlib
+import heapq
+import os
 import time
-import json
-from typing import List, Optional
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 from threading import Lock
-import logging
+
+from .error_classifier import ErrorClassifier
+from .fake_logs import FakeLogsClient
+from .fingerprint import ErrorSignature, SignatureStore
+from .log_checkpoints import LogCheckpointStore
+from .pipeline import RingBuffer, error_event_pipeline
+from .reassembly import MultilineReassembler
 
 # boto3.set_stream_logger(name='botocore', level=logging.DEBUG)
 
+# CloudWatch filter syntax: match events containing any of these terms
+DEFAULT_ERROR_FILTER_PATTERN = "?ERROR ?Error ?error"
+
+# filter_log_events accepts at most this many stream names per call
+MAX_FILTER_STREAM_NAMES = 100
+
+# How far back each filtered poll reaches, to catch events that were ingested late
+FILTER_OVERLAP_MS = 60 * 1000
+
+# Lines of a stream read on either side of a filter hit to rebuild its multi-line record
+RECORD_WINDOW_MS = 10 * 1000
+
+DEFAULT_BACKFILL_SLICE_MS = 60 * 60 * 1000
+
+# Seconds between progress checkpoints of a running backfill
+BACKFILL_CHECKPOINT_INTERVAL = 5.0
+
+
+DEFAULT_CLASSIFIER = ErrorClassifier.from_config()
+
+
 class AWSClient:
-    def __init__(self, access_key: str = None, secret_key: str = None, region: str = "us-east-1"):
+    def __init__(self, access_key: str = None, secret_key: str = None, region: str = "us-east-1", checkpoint_store: LogCheckpointStore = None, filter_pattern: str = None, classifier: ErrorClassifier = None, signature_store: SignatureStore = None, reassemble: bool = True, logs_client=None):
         self.region = region
+        self.checkpoints = checkpoint_store or LogCheckpointStore()
+        self.filter_pattern = filter_pattern or os.getenv("LOG_FILTER_PATTERN", DEFAULT_ERROR_FILTER_PATTERN)
+        self.classifier = classifier or DEFAULT_CLASSIFIER
+        self.signatures = signature_store or SignatureStore()
+        self.recent_errors = RingBuffer(1000)
+
+        # One reassembler per (group, stream); each stream is polled by one thread at a time
+        self.reassemble = reassemble
+        self._reassemblers = {}
+        self._reassemblers_lock = Lock()
+
+        # Event ids already returned by filtered polls, bounded per log group
+        self._seen_event_ids = {}
+        self._seen_lock = Lock()
         
+        # An injected client (e.g. FakeLogsClient) replaces CloudWatch; LOGS_BACKEND=fake
+        # selects the local stand-in configured from FAKE_LOGS_* variables
+        if logs_client is None and os.getenv("LOGS_BACKEND", "cloudwatch") == "fake":
+            logs_client = FakeLogsClient.from_env()
+        if logs_client is not None:
+            self.client = logs_client
         # Use environment variables or credentials directly if passed
-        if access_key and secret_key:
+        elif access_key and secret_key:
             self.client = boto3.client('logs', 
                                        aws_access_key_id=access_key, 
                                        aws_secret_access_key=secret_key,
@@ -23,9 +74,14 @@ class AWSClient:
 
     def list_log_groups(self) -> List[str]:
         try:
-            response = self.client.describe_log_groups()
-            log_groups = [log_group['logGroupName'] for log_group in response['logGroups']]
-            return log_groups
+            log_groups = []
+            params = {}
+            while True:
+                response = self.client.describe_log_groups(**params)
+                log_groups.extend(log_group['logGroupName'] for log_group in response['logGroups'])
+                if not response.get('nextToken'):
+                    return log_groups
+                params['nextToken'] = response['nextToken']
         except (NoCredentialsError, PartialCredentialsError):
             raise ValueError("Invalid or missing AWS credentials.")
         except Exception as e:
@@ -45,31 +101,365 @@ class AWSClient:
                 raise RuntimeError(f"No log streams found for log group {log_group_name}")
         except Exception as e:
             raise RuntimeError(f"Error fetching log streams: {e}")
-    
-    def listen_for_error_logs(self, log_group_name: str, log_stream_name: str) -> List[str]:
-        error_logs = []
+
+    def list_active_log_streams(self, log_group_name: str, active_within: int = 3600) -> List[str]:
+        """
+        List the streams of a log group that received events in the last active_within seconds.
+        """
+        cutoff = int((time.time() - active_within) * 1000)
+        streams = []
+        params = {
+            "logGroupName": log_group_name,
+            "orderBy": "LastEventTime",
+            "descending": True,
+        }
+        try:
+            while True:
+                response = self.client.describe_log_streams(**params)
+                for stream in response.get('logStreams', []):
+                    # Streams come newest first, so the first stale one ends the scan
+                    if stream.get('lastEventTimestamp', 0) < cutoff:
+                        return streams
+                    streams.append(stream['logStreamName'])
+                if not response.get('nextToken'):
+                    return streams
+                params['nextToken'] = response['nextToken']
+        except Exception as e:
+            raise RuntimeError(f"Error fetching log streams: {e}")
+
+    def iter_new_log_events(self, log_group_name: str, log_stream_name: str) -> Iterator[dict]:
+        """
+        Yield only the events written since the last call for this (group, stream).
+
+        Follows nextForwardToken page by page until the stream is caught up and saves a
+        checkpoint after every page, so at most one page is held in memory. A stream with
+        no checkpoint starts from its most recent page; an expired token falls back to the
+        last seen timestamp.
+        """
+        checkpoint = self.checkpoints.get(log_group_name, log_stream_name) or {}
+        next_token = checkpoint.get("next_token")
+        last_timestamp = checkpoint.get("last_timestamp")
+
+        while True:
+            params = {
+                "logGroupName": log_group_name,
+                "logStreamName": log_stream_name,
+            }
+            if next_token:
+                params.update(nextToken=next_token, startFromHead=True)
+            elif last_timestamp is not None:
+                params.update(startTime=last_timestamp + 1, startFromHead=True)
+            else:
+                params.update(startFromHead=False)
+
+            try:
+                response = self.client.get_log_events(**params)
+            except ClientError as e:
+                if next_token and e.response.get("Error", {}).get("Code") == "InvalidParameterException":
+                    # Forward tokens expire; resume from the timestamp instead
+                    next_token = None
+                    continue
+                raise
+
+            events = response.get("events", [])
+            yield from events
+            if events:
+                last_timestamp = events[-1]["timestamp"]
+
+            forward_token = response.get("nextForwardToken")
+            self.checkpoints.set(log_group_name, log_stream_name, forward_token, last_timestamp)
+
+            # The same token coming back means there is nothing newer yet
+            if not forward_token or forward_token == next_token:
+                return
+            next_token = forward_token
+
+    def get_new_log_events(self, log_group_name: str, log_stream_name: str) -> List[dict]:
+        return list(self.iter_new_log_events(log_group_name, log_stream_name))
+
+    def iter_filter_log_events(self, log_group_name: str, log_stream_names: Optional[List[str]] = None, filter_pattern: Optional[str] = None, start_time: Optional[int] = None, end_time: Optional[int] = None) -> Iterator[dict]:
+        """
+        Yield every event in a log group that matches filter_pattern, filtered server side.
+
+        Results from multiple streams come back interleaved in timestamp order. All pages are
+        followed, and stream lists longer than the API limit are split into several queries
+        whose results are merged lazily by timestamp.
+        """
+        pattern = self.filter_pattern if filter_pattern is None else filter_pattern
+        stream_batches = [None]
+        if log_stream_names:
+            stream_batches = [
+                log_stream_names[i:i + MAX_FILTER_STREAM_NAMES]
+                for i in range(0, len(log_stream_names), MAX_FILTER_STREAM_NAMES)
+            ]
+
+        def query(stream_batch):
+            params = {"logGroupName": log_group_name}
+            if pattern:
+                params["filterPattern"] = pattern
+            if stream_batch:
+                params["logStreamNames"] = stream_batch
+            if start_time is not None:
+                params["startTime"] = start_time
+            if end_time is not None:
+                params["endTime"] = end_time
+
+            while True:
+                response = self.client.filter_log_events(**params)
+                yield from response.get("events", [])
+                if not response.get("nextToken"):
+                    return
+                params["nextToken"] = response["nextToken"]
+
+        if len(stream_batches) == 1:
+            yield from query(stream_batches[0])
+        else:
+            yield from heapq.merge(*(query(batch) for batch in stream_batches), key=lambda event: event["timestamp"])
+
+    def filter_log_events(self, log_group_name: str, log_stream_names: Optional[List[str]] = None, filter_pattern: Optional[str] = None, start_time: Optional[int] = None, end_time: Optional[int] = None) -> List[dict]:
+        return list(self.iter_filter_log_events(log_group_name, log_stream_names, filter_pattern, start_time, end_time))
+
+    def iter_new_filtered_log_events(self, log_group_name: str, log_stream_names: Optional[List[str]] = None, filter_pattern: Optional[str] = None) -> Iterator[dict]:
+        """
+        Yield matching events in a log group that were not returned by a previous call.
+
+        The checkpoint for the group stores the end of the last query window. Each poll
+        reaches FILTER_OVERLAP_MS further back to pick up late-ingested events, and event
+        ids already seen are dropped.
+        """
+        checkpoint_stream = ",".join(sorted(log_stream_names)) if log_stream_names else "*"
+        checkpoint = self.checkpoints.get(log_group_name, checkpoint_stream) or {}
+        end_time = int(time.time() * 1000)
+        last_timestamp = checkpoint.get("last_timestamp")
+        start_time = end_time - FILTER_OVERLAP_MS if last_timestamp is None else last_timestamp - FILTER_OVERLAP_MS
+
+        for event in self.iter_filter_log_events(log_group_name, log_stream_names, filter_pattern, start_time, end_time):
+            if self._mark_seen(log_group_name, event.get("eventId")):
+                yield event
+
+        self.checkpoints.set(log_group_name, checkpoint_stream, None, end_time)
+
+    def _mark_seen(self, log_group_name: str, key) -> bool:
+        """
+        Remember key (an event id, or a line) for the group. Returns False if it already was.
+        """
+        with self._seen_lock:
+            seen_order, seen_ids = self._seen_event_ids.setdefault(log_group_name, (deque(maxlen=10000), set()))
+            if key in seen_ids:
+                return False
+            if len(seen_order) == seen_order.maxlen:
+                seen_ids.discard(seen_order[0])
+            seen_order.append(key)
+            seen_ids.add(key)
+            return True
+
+    def get_new_filtered_log_events(self, log_group_name: str, log_stream_names: Optional[List[str]] = None, filter_pattern: Optional[str] = None) -> List[dict]:
+        return list(self.iter_new_filtered_log_events(log_group_name, log_stream_names, filter_pattern))
+
+    def iter_new_filtered_records(self, log_group_name: str, log_stream_names: Optional[List[str]] = None) -> Iterator[dict]:
+        """
+        iter_new_filtered_log_events, with each hit replaced by the whole multi-line
+        record it belongs to (unless reassembly is off).
+
+        The filter only matches single lines, so the lines of the hit's stream within
+        RECORD_WINDOW_MS are fetched and reassembled. Every line of a returned record is
+        remembered, so further hits inside it (the "ValueError: ..." after a traceback)
+        are not returned again, in this poll or a later one.
+        """
+        for event in self.iter_new_filtered_log_events(log_group_name, log_stream_names):
+            if not self.reassemble:
+                yield event
+                continue
+            stream = event.get("logStreamName")
+            if not self._mark_seen(log_group_name, (stream, event["timestamp"], event["message"])):
+                continue
+            yield self._record_around(log_group_name, event)
+
+    def _record_around(self, log_group_name: str, event: dict) -> dict:
+        stream = event.get("logStreamName")
+        if not stream:
+            return event
+        try:
+            response = self.client.get_log_events(
+                logGroupName=log_group_name,
+                logStreamName=stream,
+                startTime=event["timestamp"] - RECORD_WINDOW_MS,
+                endTime=event["timestamp"] + RECORD_WINDOW_MS,
+                startFromHead=True,
+            )
+        except Exception as e:
+            print(f"Reading the lines around an error in {log_group_name}/{stream} failed: {e}")
+            return event
+
+        # Feeding one line at a time: whenever a record comes out, the line just fed
+        # started the next one, so records and groups of lines line up
+        reassembler = MultilineReassembler(max_streams=1)
+        groups, records = [[]], []
+        for line in response.get("events", []):
+            completed = list(reassembler.feed([line], stream))
+            if completed:
+                records.extend(completed)
+                groups.append([])
+            groups[-1].append(line)
+        records.extend(reassembler.flush(expired_only=False))
+        groups = [group for group in groups if group]
+
+        for group, record in zip(groups, records):
+            if any(line["timestamp"] == event["timestamp"] and line["message"] == event["message"] for line in group):
+                for line in group:
+                    self._mark_seen(log_group_name, (stream, line["timestamp"], line["message"]))
+                return dict(event, timestamp=record["timestamp"], message=record["message"])
+        # Not in the window (e.g. the stream was trimmed meanwhile)
+        return event
+
+    def backfill_log_events(self, log_group_name: str, start_time: int, end_time: int, log_stream_names: Optional[List[str]] = None, filter_pattern: Optional[str] = None, slice_ms: int = DEFAULT_BACKFILL_SLICE_MS, max_workers: int = 8, resume: bool = False) -> Iterator[dict]:
+        """
+        Yield every matching event in [start_time, end_time) in timestamp order, scanning
+        time slices in parallel with filter_log_events.
+
+        Slice boundaries are aligned to multiples of slice_ms. At most max_workers slices
+        are fetched at a time and at most twice that many are held waiting for their turn.
+        While a scan runs, how far it got is checkpointed (at most every
+        BACKFILL_CHECKPOINT_INTERVAL seconds); the checkpoint is removed once the scan
+        completes. With resume=True a scan of the same range that was interrupted picks
+        up after its last checkpoint, so events since then may be yielded again.
+        """
+        pattern = self.filter_pattern if filter_pattern is None else filter_pattern
+        scan_id = hashlib.sha1(f"{pattern}|{','.join(sorted(log_stream_names or []))}|{start_time}-{end_time}".encode()).hexdigest()[:12]
+        checkpoint_key = f"backfill:{scan_id}"
+
+        slices = []
+        slice_start = start_time
+        if resume:
+            slice_start = max(start_time, (self.checkpoints.get(log_group_name, checkpoint_key) or {}).get("last_timestamp") or start_time)
+        while slice_start < end_time:
+            slice_end = min(end_time, (slice_start // slice_ms + 1) * slice_ms)
+            slices.append((slice_start, slice_end))
+            slice_start = slice_end
+
+        def fetch(time_slice):
+            # endTime is inclusive, so stop one millisecond before the next slice
+            return list(self.iter_filter_log_events(log_group_name, log_stream_names, pattern, time_slice[0], time_slice[1] - 1))
+
+        window = max_workers * 2
+        last_checkpoint = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="log-backfill") as executor:
+            pending = deque()
+            next_slice = 0
+            try:
+                while pending or next_slice < len(slices):
+                    while next_slice < len(slices) and len(pending) < window:
+                        pending.append((slices[next_slice], executor.submit(fetch, slices[next_slice])))
+                        next_slice += 1
+
+                    # Slices are disjoint and in order, so yielding them in order keeps timestamps sorted
+                    time_slice, future = pending.popleft()
+                    yield from future.result()
+                    if time.monotonic() - last_checkpoint >= BACKFILL_CHECKPOINT_INTERVAL:
+                        self.checkpoints.set(log_group_name, checkpoint_key, None, time_slice[1])
+                        last_checkpoint = time.monotonic()
+                self.checkpoints.clear(log_group_name, checkpoint_key)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def backfill_error_logs(self, log_group_name: str, start_time: int, end_time: int, log_stream_names: Optional[List[str]] = None, max_workers: int = 8, max_error_logs: int = 50, resume: bool = False) -> List[str]:
+        """
+        Scan [start_time, end_time) of a log group and return its distinct errors, most
+        frequent first, as one summary line per signature with counts for that range.
+        """
+        in_range = {}
+        try:
+            raw_events = self.backfill_log_events(log_group_name, start_time, end_time, log_stream_names, max_workers=max_workers, resume=resume)
+            for event in error_event_pipeline(raw_events, log_group_name, None, self.classifier, self.signatures):
+                stats = in_range.get(event.fingerprint)
+                if stats is None:
+                    in_range[event.fingerprint] = [1, event.timestamp, event.timestamp, event.message]
+                else:
+                    stats[0] += 1
+                    stats[2] = event.timestamp
+            self.signatures.save()
+        except Exception as e:
+            raise RuntimeError(f"Error backfilling error logs: {e}")
+
+        ranked = sorted(in_range.items(), key=lambda item: item[1][0], reverse=True)[:max_error_logs]
+        return [
+            ErrorSignature(fingerprint, "", sample, count, first_seen, last_seen).summary()
+            for fingerprint, (count, first_seen, last_seen, sample) in ranked
+        ]
+
+    def save(self) -> None:
+        """
+        Write out signature and checkpoint changes still held back by the stores'
+        autosave intervals.
+        """
+        self.signatures.save()
+        self.checkpoints.save()
+
+    def get_reassembler(self, log_group_name: str, log_stream_name: str) -> MultilineReassembler:
+        with self._reassemblers_lock:
+            key = (log_group_name, log_stream_name)
+            if key not in self._reassemblers:
+                self._reassemblers[key] = MultilineReassembler()
+            return self._reassemblers[key]
+
+    def iter_raw_log_events(self, log_group_name: str, log_stream_name: str, mode: str = "filter") -> Iterator[dict]:
+        """
+        Fetch stage of the error pipeline: one poll's worth of events in the given mode.
+
+        mode="filter" asks CloudWatch for events matching the filter pattern only.
+        mode="tail" downloads every new event since the saved checkpoint.
+        mode="scan" rescans the most recent page.
+
+        Events split line by line (e.g. tracebacks) are joined back into one record per
+        error: in filter mode by reading the lines around each hit (see
+        iter_new_filtered_records), otherwise as they stream past.
+        """
+        if mode == "filter":
+            return self.iter_new_filtered_records(log_group_name, [log_stream_name])
+        if mode == "tail":
+            events = self.iter_new_log_events(log_group_name, log_stream_name)
+        else:
+            response = self.client.get_log_events(
+                logGroupName=log_group_name,
+                logStreamName=log_stream_name,
+                startFromHead=False  # Get the latest events
+            )
+            events = iter(response.get('events', []))
+        if not self.reassemble:
+            return events
+        return self.get_reassembler(log_group_name, log_stream_name).reassemble(events, log_stream_name)
+
+    def listen_for_error_logs(self, log_group_name: str, log_stream_name: str, poll_interval: int = 5, mode: str = "filter", dedupe: bool = True, max_error_logs: int = 50) -> List[str]:
+        """
+        Poll a log stream until error logs show up and return their messages.
+
+        Each poll streams events through fetch -> parse -> classify -> fingerprint, so
+        memory stays flat however many events pass. With dedupe=True polling continues
+        until a signature shows up that has never been seen before, and one summary line
+        with count, first and last seen is returned per new signature. At most
+        max_error_logs entries are returned; see iter_raw_log_events for the modes.
+        """
+        error_events = []
         try:
             # Poll logs for new entries
             while True:
-                response = self.client.get_log_events(
-                    logGroupName=log_group_name,
-                    logStreamName=log_stream_name,
-                    startFromHead=False  # Get the latest events
-                )
-
-                for event in response.get('events', []):
-                    message = event['message']
-                    if 'error' in message.lower():  # Simple error check, can be more advanced
-                        error_logs.append(message)
+                raw_events = self.iter_raw_log_events(log_group_name, log_stream_name, mode)
+                for event in error_event_pipeline(raw_events, log_group_name, log_stream_name, self.classifier, self.signatures):
+                    self.recent_errors.append(event)
+                    if (event.is_new or not dedupe) and len(error_events) < max_error_logs:
+                        error_events.append(event)
                 
                 # Break after finding errors or continue depending on your needs
-                if error_logs:
+                if error_events:
                     break
 
-                # Poll every 5 seconds
-                time.sleep(5)
-            
-            return error_logs
+                time.sleep(poll_interval)
+
+            self.signatures.save()
+            if dedupe:
+                return [self.signatures.summary(event.fingerprint, event.message) for event in error_events]
+            return [event.message for event in error_events]
         except Exception as e:
             raise RuntimeError(f"Error listening for error logs: {e}")
 
@@ -77,11 +467,23 @@ class AWSClientManager:
     _client: AWSClient = None
 
     @classmethod
-    def initialize(cls, access_key: str = None, secret_key: str = None, region: str = "us-east-1") -> None:
-        cls._client = AWSClient(access_key, secret_key, region)
+    def initialize(cls, access_key: str = None, secret_key: str = None, region: str = "us-east-1", logs_client=None) -> None:
+        cls.install(AWSClient(access_key, secret_key, region, logs_client=logs_client))
+
+    @classmethod
+    def install(cls, client: AWSClient) -> None:
+        cls._client = client
 
     @classmethod
     def get_client(cls) -> AWSClient:
         if cls._client is None:
             raise RuntimeError("AWS client has not been initialized. Call initialize() first.")
         return cls._client
+
+    @classmethod
+    def save(cls) -> None:
+        """
+        Write out what the current client's stores have not written yet.
+        """
+        if cls._client is not None:
+            cls._client.save()
@@ -1,7 +1,10 @@
-from typing import List
+import time
+from typing import List, Optional
 from portia import Tool, ToolRunContext
 from pydantic import BaseModel, Field
+from ...jobs import current_job
 from .aws_client import AWSClientManager
+from .log_watcher import LogWatcherManager
 
 
 class InitAWSClientSchema(BaseModel):
@@ -34,6 +37,16 @@ class ListenForErrorLogsSchema(BaseModel):
     log_group_name: str = Field(..., description="Log group name")
     log_stream_name: str = Field(..., description="Log stream name to listen for errors")
 
+class BackfillErrorLogsSchema(BaseModel):
+    """Schema to scan the history of a CloudWatch log group for distinct errors."""
+    log_group_name: str = Field(..., description="Log group name")
+    days: float = Field(7, description="How many days back from now to scan")
+    log_stream_names: Optional[List[str]] = Field(None, description="Only scan these log streams. Leave empty to scan every stream")
+
+class WatchErrorLogsSchema(BaseModel):
+    """Schema to watch every active stream of many CloudWatch log groups for errors."""
+    log_group_names: Optional[List[str]] = Field(None, description="Log groups to watch. Leave empty to watch every log group in the account")
+    max_wait_seconds: float = Field(300, description="Give up and return an empty list if no new error shows up within this many seconds")
 
 
 # Example Tool: List AWS CloudWatch Log Groups
@@ -73,3 +86,45 @@ class ListenForErrorLogs(Tool):
     def run(self, _:ToolRunContext, log_group_name: str, log_stream_name: str) -> List[str]:
         client = AWSClientManager.get_client()
         return client.listen_for_error_logs(log_group_name, log_stream_name)
+
+
+# Example Tool: Backfill Error Logs over a time range
+class BackfillErrorLogs(Tool):
+    id: str = "backfill_error_logs"
+    name: str = "backfill_error_logs"
+    description: str = "Scan the last N days of a CloudWatch log group and return its distinct errors, most frequent first."
+    args_schema: type[BaseModel] = BackfillErrorLogsSchema  # Define schema for this tool
+    output_schema: tuple[str, str] = ("List", "One line per distinct error with its count, first and last seen time in the range")
+
+    def run(self, _:ToolRunContext, log_group_name: str, days: float = 7, log_stream_names: Optional[List[str]] = None) -> List[str]:
+        client = AWSClientManager.get_client()
+        end_time = int(time.time() * 1000)
+        start_time = end_time - int(days * 24 * 60 * 60 * 1000)
+        return client.backfill_error_logs(log_group_name, start_time, end_time, log_stream_names or None)
+
+
+# Example Tool: Watch Error Logs across log groups
+class WatchErrorLogs(Tool):
+    id: str = "watch_error_logs"
+    name: str = "watch_error_logs"
+    description: str = "Watch every active stream of the given CloudWatch log groups (or all log groups) for error logs."
+    args_schema: type[BaseModel] = WatchErrorLogsSchema  # Define schema for this tool
+    output_schema: tuple[str, str] = ("List", "Wait for error logs from any watched stream and return them as a list, empty if none showed up in time")
+
+    def run(self, _:ToolRunContext, log_group_names: Optional[List[str]] = None, max_wait_seconds: float = 300) -> List[str]:
+        watcher = LogWatcherManager.start(log_group_names or None)
+        signatures = watcher.client.signatures
+        job = current_job()
+        deadline = time.monotonic() + max_wait_seconds
+        # Keep waiting while every error belongs to a signature that was already reported
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            # Short waits, so a cancelled or timed out job is noticed between them
+            if job is not None:
+                job.check()
+            new_events = {event.fingerprint: event for event in watcher.get_error_events(timeout=min(remaining, 1.0)) if event.is_new}
+            if new_events:
+                signatures.save()
+                return [signatures.summary(fingerprint, event.message) for fingerprint, event in new_events.items()]
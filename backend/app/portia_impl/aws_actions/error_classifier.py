@@ -0,0 +1,201 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional
+
+SEVERITY_LEVELS = {
+    "warning": 1,
+    "error": 2,
+    "critical": 3,
+}
+
+
+class Classification(NamedTuple):
+    severity: str
+    category: str
+    rule: str
+
+
+class ErrorRule:
+    """
+    A single detection rule.
+
+    Text rules match on keywords (whole words) or a regex. JSON rules match structured
+    log lines whose json_field (dotted path, e.g. "level" or "error.type") is one of
+    json_values, or simply present when json_values is empty.
+
+    hints are lowercase substrings that must appear in a message for the rule to match
+    at all. Keywords are their own hints; regex rules without hints are always tried.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        category: str,
+        severity: str = "error",
+        keywords: Optional[List[str]] = None,
+        regex: Optional[str] = None,
+        json_field: Optional[str] = None,
+        json_values: Optional[List[str]] = None,
+        case_sensitive: bool = False,
+        hints: Optional[List[str]] = None,
+    ):
+        if severity not in SEVERITY_LEVELS:
+            raise ValueError(f"Unknown severity {severity!r}, expected one of {list(SEVERITY_LEVELS)}")
+        if not (keywords or regex or json_field):
+            raise ValueError(f"Rule {name!r} needs keywords, a regex or a json_field")
+        self.name = name
+        self.category = category
+        self.severity = severity
+        self.keywords = keywords or []
+        self.regex = regex
+        self.json_field = json_field
+        self.json_values = {str(value).lower() for value in json_values or []}
+        self.case_sensitive = case_sensitive
+        if hints is None and keywords and not regex:
+            hints = keywords
+        self.hints = [hint.lower() for hint in hints or []]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ErrorRule":
+        return cls(**data)
+
+    def text_pattern(self) -> Optional[str]:
+        parts = [rf"\b{re.escape(keyword)}\b" for keyword in self.keywords]
+        if self.regex:
+            parts.append(self.regex)
+        if not parts:
+            return None
+        pattern = "|".join(f"(?:{part})" for part in parts)
+        return pattern if self.case_sensitive else f"(?i:{pattern})"
+
+
+DEFAULT_ERROR_RULES = [
+    ErrorRule("fatal", "crash", "critical", keywords=["FATAL", "CRITICAL", "panic", "Segmentation fault", "OutOfMemoryError"]),
+    ErrorRule("traceback", "exception", "error", regex=r"Traceback \(most recent call last\)", case_sensitive=True, hints=["traceback"]),
+    ErrorRule("exception_class", "exception", "error", regex=r"\b[A-Z]\w*(?:Exception|Error)\b", case_sensitive=True, hints=["exception", "error"]),
+    ErrorRule("error_keyword", "error", "error", keywords=["error", "exception", "failed", "unhandled"]),
+    ErrorRule("http_5xx", "http", "error", regex=r"\b(?:HTTP/\d(?:\.\d)?\"? |status[=: ]+)5\d\d\b", hints=["http/", "status"]),
+    ErrorRule("json_level", "structured", "error", json_field="level", json_values=["error", "err", "fatal", "critical"]),
+    ErrorRule("json_error", "structured", "error", json_field="error"),
+    ErrorRule("warning", "warning", "warning", keywords=["WARN", "WARNING"]),
+]
+
+
+class ErrorClassifier:
+    """
+    Classify log messages with the text rules compiled into a single regex.
+
+    Each rule becomes a named group of one alternation, so a message is scanned once no
+    matter how many rules there are. When several rules match, the most severe wins.
+    A cheap literal pass over the lowercased message first picks the rules whose hints
+    occur; messages with none skip the regex entirely, and the others are scanned by an
+    alternation of just the candidate rules, compiled once per candidate set.
+    Messages that are JSON objects are parsed once: JSON rules run against their fields
+    and text rules only against the human readable fields in json_text_fields. Those
+    whose level field says info, debug or trace are not errors, whatever their text.
+    """
+
+    json_text_fields = ("message", "msg", "exception", "stack", "stack_trace")
+    json_level_fields = ("level", "severity")
+    json_quiet_levels = frozenset(("info", "debug", "trace"))
+
+    def __init__(self, rules: Optional[Iterable[ErrorRule]] = None, min_severity: str = "error"):
+        self.rules = list(DEFAULT_ERROR_RULES if rules is None else rules)
+        self.min_level = SEVERITY_LEVELS[min_severity]
+
+        self._rules_by_group = {}
+        self._hints = []
+        self._unhinted = set()
+        for index, rule in enumerate(self.rules):
+            if rule.text_pattern():
+                self._rules_by_group[f"r{index}"] = rule
+                if rule.hints:
+                    self._hints.extend((hint, index) for hint in rule.hints)
+                else:
+                    self._unhinted.add(index)
+        self._json_rules = [rule for rule in self.rules if rule.json_field]
+        self._compile = lru_cache(maxsize=256)(self._compile_candidates)
+
+    def _compile_candidates(self, candidates: frozenset) -> re.Pattern:
+        return re.compile("|".join(
+            f"(?P<r{index}>{self.rules[index].text_pattern()})" for index in sorted(candidates)
+        ))
+
+    def _candidates(self, text: str) -> frozenset:
+        lowered = text.lower()
+        return frozenset(self._unhinted.union(index for hint, index in self._hints if hint in lowered))
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None, min_severity: str = "error") -> "ErrorClassifier":
+        """
+        Load rules from a JSON list of rule dicts, falling back to the defaults when no
+        path is given or set in ERROR_RULES_PATH.
+        """
+        path = path or os.getenv("ERROR_RULES_PATH")
+        if not path:
+            return cls(min_severity=min_severity)
+        with open(path) as f:
+            rules = [ErrorRule.from_dict(rule) for rule in json.load(f)]
+        return cls(rules, min_severity=min_severity)
+
+    def classify(self, message: str) -> Optional[Classification]:
+        """
+        Return the classification of the most severe matching rule, or None if nothing at
+        or above min_severity matched.
+        """
+        best = None
+        best_level = 0
+        text = message
+
+        if message.lstrip().startswith("{"):
+            data = self._parse_json(message)
+            if data is not None:
+                if any(str(data.get(field, "")).lower() in self.json_quiet_levels for field in self.json_level_fields):
+                    return None
+                text = "\n".join(str(data[field]) for field in self.json_text_fields if data.get(field))
+                for rule in self._match_json(data):
+                    level = SEVERITY_LEVELS[rule.severity]
+                    if level > best_level:
+                        best, best_level = rule, level
+
+        candidates = self._candidates(text) if best_level < SEVERITY_LEVELS["critical"] else None
+        if candidates:
+            for match in self._compile(candidates).finditer(text):
+                rule = self._rules_by_group[match.lastgroup]
+                level = SEVERITY_LEVELS[rule.severity]
+                if level > best_level:
+                    best, best_level = rule, level
+                    if level == SEVERITY_LEVELS["critical"]:
+                        break
+
+        if best is None or best_level < self.min_level:
+            return None
+        return Classification(best.severity, best.category, best.name)
+
+    def is_error(self, message: str) -> bool:
+        return self.classify(message) is not None
+
+    @staticmethod
+    def _parse_json(message: str) -> Optional[dict]:
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _match_json(self, data: dict) -> List[ErrorRule]:
+        matched = []
+        for rule in self._json_rules:
+            value = data
+            for key in rule.json_field.split("."):
+                if not isinstance(value, dict) or key not in value:
+                    value = None
+                    break
+                value = value[key]
+            if value in (None, "", [], {}):
+                continue
+            if not rule.json_values or str(value).lower() in rule.json_values:
+                matched.append(rule)
+        return matched
@@ -0,0 +1,338 @@
+import json
+import os
+import random
+import re
+import shlex
+import time
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+from botocore.exceptions import ClientError
+
+SYNTHETIC_INFO_LINES = [
+    "INFO  request_id={rid} GET /api/orders/{n} 200 {ms}ms",
+    "DEBUG cache hit for key order:{n}",
+    "INFO  Processed batch {n}: 0 errors, {ms} records",
+]
+SYNTHETIC_ERROR_LINES = [
+    "ERROR request_id={rid} failed to charge card for order {n}",
+    "ERROR Unhandled exception in worker\nTraceback (most recent call last):\n  File \"/var/task/app/handlers/pay.py\", line {line}, in charge\n    amount = int(order.total)\nValueError: invalid literal for int() with base 10: '{n}'",
+    "FATAL database connection pool exhausted after {ms}ms",
+]
+
+# get_log_events and filter_log_events return at most this many events per page
+PAGE_SIZE = 10000
+
+
+class _FakeStream:
+    __slots__ = ("name", "events", "offset", "retention")
+
+    def __init__(self, name: str, retention: int):
+        self.name = name
+        self.events: List[dict] = []
+        # Absolute index of events[0], so tokens stay valid as old events are dropped
+        self.offset = 0
+        self.retention = retention
+
+    def append(self, event: dict) -> None:
+        self.events.append(event)
+        # Trim in chunks so appends stay amortized O(1)
+        if len(self.events) >= 2 * self.retention:
+            drop = len(self.events) - self.retention
+            del self.events[:drop]
+            self.offset += drop
+
+    def index_at(self, timestamp: int) -> int:
+        """
+        Absolute index of the first event at or after timestamp.
+        """
+        return self.offset + bisect_left(self.events, timestamp, key=lambda event: event["timestamp"])
+
+    @property
+    def last_event_timestamp(self) -> Optional[int]:
+        return self.events[-1]["timestamp"] if self.events else None
+
+
+def compile_filter_pattern(pattern: Optional[str]):
+    """
+    Compile the subset of the CloudWatch filter syntax used for unstructured logs:
+    terms that must all appear, "?term" alternatives of which one must appear,
+    "-term" exclusions and "quoted phrases". Matching is case sensitive, like CloudWatch.
+    """
+    if not pattern or not pattern.strip():
+        return lambda message: True
+    required, optional, excluded = [], [], []
+    for term in shlex.split(pattern):
+        if term.startswith("?"):
+            optional.append(term[1:])
+        elif term.startswith("-"):
+            excluded.append(term[1:])
+        else:
+            required.append(term)
+
+    def matches(message: str) -> bool:
+        if any(term in message for term in excluded):
+            return False
+        if not all(term in message for term in required):
+            return False
+        return not optional or any(term in message for term in optional)
+
+    return matches
+
+
+class FakeLogsClient:
+    """
+    In-process stand-in for boto3's CloudWatch Logs client.
+
+    Serves describe_log_groups, describe_log_streams, get_log_events and
+    filter_log_events with the same request parameters and response shapes. Events come
+    from recorded files, from a synthetic generator, or both: with events_per_second set,
+    new events are generated lazily on every call for the time elapsed since the last
+    one, spread over all streams, with error_ratio of them being errors. Recorded
+    events are replayed at that rate instead when replay=True. Each stream keeps roughly
+    its last retention events; older ones expire like they would under a retention policy.
+    """
+
+    def __init__(
+        self,
+        groups: Optional[Dict[str, List[str]]] = None,
+        events_per_second: float = 0.0,
+        error_ratio: float = 0.01,
+        retention: int = 100000,
+        replay: bool = False,
+        seed: Optional[int] = None,
+    ):
+        groups = groups or {"/fake/app": ["stream-0"]}
+        self.events_per_second = events_per_second
+        self.error_ratio = error_ratio
+        self.retention = retention
+        self.replay = replay
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        self._groups: Dict[str, Dict[str, _FakeStream]] = {
+            group: {stream: _FakeStream(stream, retention) for stream in streams}
+            for group, streams in groups.items()
+        }
+        self._recorded: Dict[tuple, deque] = {}
+        self._generated_until = time.time()
+        self._carry = 0.0
+        self._sequence = 0
+        self.calls: Dict[str, int] = {}
+
+    @classmethod
+    def from_path(cls, path: str, **kwargs) -> "FakeLogsClient":
+        """
+        Load recorded logs from a directory laid out as <group>/<stream>.log or
+        <group>/<stream>.jsonl. Group directory names use "__" for "/", so
+        "__aws__lambda__pay" is served as "/aws/lambda/pay". .jsonl lines are
+        {"timestamp": ..., "message": ...} objects; .log files hold one event per line,
+        with indented lines joined to the line before.
+        """
+        groups = {}
+        recorded = {}
+        for group_dir in sorted(os.listdir(path)):
+            group_path = os.path.join(path, group_dir)
+            if not os.path.isdir(group_path):
+                continue
+            group = group_dir.replace("__", "/")
+            groups[group] = []
+            for file_name in sorted(os.listdir(group_path)):
+                stream, extension = os.path.splitext(file_name)
+                if extension not in (".log", ".jsonl"):
+                    continue
+                groups[group].append(stream)
+                recorded[(group, stream)] = list(_read_recorded(os.path.join(group_path, file_name), extension))
+
+        client = cls(groups, **kwargs)
+        now = int(time.time() * 1000)
+        for (group, stream), events in recorded.items():
+            if client.replay:
+                client._recorded[(group, stream)] = deque(event["message"] for event in events)
+            else:
+                for event in sorted(events, key=lambda event: event.get("timestamp") or now):
+                    client._append(group, stream, event.get("timestamp") or now, event["message"])
+        return client
+
+    @classmethod
+    def from_env(cls) -> "FakeLogsClient":
+        path = os.getenv("FAKE_LOGS_PATH")
+        kwargs = {
+            "events_per_second": float(os.getenv("FAKE_LOGS_EVENTS_PER_SECOND", "0")),
+            "error_ratio": float(os.getenv("FAKE_LOGS_ERROR_RATIO", "0.01")),
+        }
+        if path:
+            return cls.from_path(path, replay=kwargs["events_per_second"] > 0, **kwargs)
+        return cls(**kwargs)
+
+    # Generation
+
+    def _append(self, group: str, stream: str, timestamp: int, message: str) -> None:
+        self._sequence += 1
+        self._groups[group][stream].append({
+            "timestamp": timestamp,
+            "ingestionTime": timestamp,
+            "message": message,
+            "eventId": str(self._sequence),
+        })
+
+    def _synthetic_message(self) -> str:
+        is_error = self._random.random() < self.error_ratio
+        template = self._random.choice(SYNTHETIC_ERROR_LINES if is_error else SYNTHETIC_INFO_LINES)
+        return template.format(
+            rid=f"{self._random.getrandbits(64):016x}",
+            n=self._random.randint(1, 10 ** 6),
+            ms=self._random.randint(1, 5000),
+            line=self._random.randint(10, 200),
+        )
+
+    def _generate(self) -> None:
+        if self.events_per_second <= 0:
+            return
+        now = time.time()
+        elapsed = now - self._generated_until
+        due = elapsed * self.events_per_second + self._carry
+        count = int(due)
+        self._carry = due - count
+        if count <= 0:
+            return
+        self._generated_until = now
+
+        streams = [(group, stream) for group, group_streams in self._groups.items() for stream in group_streams]
+        start = now - elapsed
+        for i in range(count):
+            group, stream = streams[i % len(streams)]
+            timestamp = int((start + elapsed * (i + 1) / count) * 1000)
+            recorded = self._recorded.get((group, stream))
+            if self.replay:
+                if not recorded:
+                    continue
+                message = recorded[0]
+                recorded.rotate(-1)
+            else:
+                message = self._synthetic_message()
+            self._append(group, stream, timestamp, message)
+
+    def _count(self, operation: str) -> None:
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    # boto3 logs client API
+
+    def describe_log_groups(self, nextToken: Optional[str] = None, limit: int = 50, **_) -> dict:
+        with self._lock:
+            self._count("describe_log_groups")
+            names = sorted(self._groups)
+        start = int(nextToken or 0)
+        response = {"logGroups": [{"logGroupName": name} for name in names[start:start + limit]]}
+        if start + limit < len(names):
+            response["nextToken"] = str(start + limit)
+        return response
+
+    def describe_log_streams(self, logGroupName: str, orderBy: str = "LogStreamName", descending: bool = False, limit: int = 50, nextToken: Optional[str] = None, **_) -> dict:
+        with self._lock:
+            self._count("describe_log_streams")
+            self._generate()
+            streams = [
+                {
+                    "logStreamName": stream.name,
+                    "lastEventTimestamp": stream.last_event_timestamp or 0,
+                    "lastIngestionTime": stream.last_event_timestamp or 0,
+                }
+                for stream in self._group(logGroupName).values()
+            ]
+        key = (lambda s: s["lastEventTimestamp"]) if orderBy == "LastEventTime" else (lambda s: s["logStreamName"])
+        streams.sort(key=key, reverse=descending)
+        start = int(nextToken or 0)
+        response = {"logStreams": streams[start:start + limit]}
+        if start + limit < len(streams):
+            response["nextToken"] = str(start + limit)
+        return response
+
+    def get_log_events(self, logGroupName: str, logStreamName: str, startTime: Optional[int] = None, endTime: Optional[int] = None, nextToken: Optional[str] = None, limit: int = PAGE_SIZE, startFromHead: bool = False, **_) -> dict:
+        with self._lock:
+            self._count("get_log_events")
+            self._generate()
+            stream = self._group(logGroupName).get(logStreamName)
+            if stream is None:
+                raise _client_error("ResourceNotFoundException", f"The specified log stream does not exist: {logStreamName}")
+            offset = stream.offset
+            end = offset + len(stream.events)
+            if nextToken:
+                position = max(offset, int(nextToken.split("/", 1)[1]))
+            elif startTime is not None:
+                position = stream.index_at(startTime)
+            elif startFromHead:
+                position = offset
+            else:
+                position = max(offset, end - limit)
+            page = stream.events[position - offset:position - offset + limit]
+
+        if endTime is not None:
+            page = [event for event in page if event["timestamp"] <= endTime]
+        forward = position + len(page)
+        return {
+            "events": [{k: event[k] for k in ("timestamp", "message", "ingestionTime")} for event in page],
+            "nextForwardToken": f"f/{forward}",
+            "nextBackwardToken": f"b/{position}",
+        }
+
+    def filter_log_events(self, logGroupName: str, logStreamNames: Optional[List[str]] = None, startTime: Optional[int] = None, endTime: Optional[int] = None, filterPattern: Optional[str] = None, nextToken: Optional[str] = None, limit: int = PAGE_SIZE, **_) -> dict:
+        matches = compile_filter_pattern(filterPattern)
+        with self._lock:
+            self._count("filter_log_events")
+            self._generate()
+            group = self._group(logGroupName)
+            streams = [group[name] for name in logStreamNames or group if name in group]
+            # Only the requested time range is copied out, found by bisecting each stream
+            snapshots = []
+            for stream in streams:
+                first = stream.index_at(startTime) - stream.offset if startTime is not None else 0
+                last = stream.index_at(endTime + 1) - stream.offset if endTime is not None else len(stream.events)
+                snapshots.append((stream.name, stream.events[first:last]))
+
+        found = [
+            dict(event, logStreamName=stream_name)
+            for stream_name, events in snapshots
+            for event in events
+            if matches(event["message"])
+        ]
+        found.sort(key=lambda event: (event["timestamp"], int(event["eventId"])))
+
+        start = int(nextToken or 0)
+        response = {"events": found[start:start + limit], "searchedLogStreams": [
+            {"logStreamName": name, "searchedCompletely": True} for name, _ in snapshots
+        ]}
+        if start + limit < len(found):
+            response["nextToken"] = str(start + limit)
+        return response
+
+    def _group(self, log_group_name: str) -> Dict[str, _FakeStream]:
+        group = self._groups.get(log_group_name)
+        if group is None:
+            raise _client_error("ResourceNotFoundException", f"The specified log group does not exist: {log_group_name}")
+        return group
+
+
+def _read_recorded(path: str, extension: str) -> Iterable[dict]:
+    with open(path) as f:
+        if extension == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        message = None
+        for line in f:
+            line = line.rstrip("\n")
+            if message is not None and re.match(r"\s", line):
+                message += "\n" + line
+                continue
+            if message is not None:
+                yield {"message": message}
+            message = line
+        if message is not None:
+            yield {"message": message}
+
+
+def _client_error(code: str, message: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, "FakeLogsClient")
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_SIGNATURE_PATH = ".error_signatures.json"
+
+# Only this much of a normalized message takes part in its fingerprint
+FINGERPRINT_CHARS = 2000
+
+# Order matters: the specific shapes must be replaced before the bare numbers inside them
+NORMALIZERS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<time>"),
+    (re.compile(r"\b\d{4}[-/]\d{2}[-/]\d{2}\b"), "<date>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<uuid>"),
+    (re.compile(r"(?i)\b(request[_-]?id|req[_-]?id|trace[_-]?id|span[_-]?id|correlation[_-]?id)([=: ]+)\S+"), r"\1\2<id>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<addr>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{12,}\b"), "<hex>"),
+    (re.compile(r"\d+"), "<n>"),
+    (re.compile(r"[ \t]+"), " "),
+]
+
+
+def normalize_message(message: str) -> str:
+    """
+    Strip the parts of a log message that change between occurrences of the same error:
+    timestamps, UUIDs, request ids, memory addresses, IPs, long hex ids and numbers.
+    """
+    for pattern, replacement in NORMALIZERS:
+        message = pattern.sub(replacement, message)
+    return message.strip()
+
+
+def fingerprint_message(message: str) -> Tuple[str, str]:
+    """
+    Return (fingerprint, normalized message) for a log message.
+    """
+    normalized = normalize_message(message)
+    digest = hashlib.sha1(normalized[:FINGERPRINT_CHARS].encode("utf-8", "replace")).hexdigest()
+    return digest[:16], normalized
+
+
+class ErrorSignature:
+    __slots__ = ("fingerprint", "normalized", "sample", "count", "first_seen", "last_seen")
+
+    def __init__(self, fingerprint: str, normalized: str, sample: str, count: int = 0, first_seen: Optional[int] = None, last_seen: Optional[int] = None):
+        self.fingerprint = fingerprint
+        self.normalized = normalized
+        self.sample = sample
+        self.count = count
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ErrorSignature":
+        return cls(**data)
+
+    def summary(self) -> str:
+        return f"[{self.count}x, first seen {_format_ms(self.first_seen)}, last seen {_format_ms(self.last_seen)}] {self.sample}"
+
+
+def _format_ms(timestamp: Optional[int]) -> str:
+    if timestamp is None:
+        return "unknown"
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+class SignatureStore:
+    """
+    Group error messages into signatures and remember which signatures were seen before.
+
+    Signatures are persisted to a JSON file (pass path="" to keep them in memory) so a
+    bug that was already analyzed does not start another analysis after a restart. The
+    least recently seen signatures are dropped beyond max_signatures.
+
+    Changes, new signatures included, are written at most every autosave_interval
+    seconds, so a burst of distinct errors costs one write rather than one per error.
+    Callers that act on a new signature call save() first, so it is on disk before the
+    analysis it starts.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_signatures: int = 10000, autosave_interval: float = 5.0):
+        self.path = os.getenv("ERROR_SIGNATURE_PATH", DEFAULT_SIGNATURE_PATH) if path is None else path
+        self.max_signatures = max_signatures
+        self.autosave_interval = autosave_interval
+        self._lock = Lock()
+        self._signatures = self._load()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+    def _load(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return {data["fingerprint"]: ErrorSignature.from_dict(data) for data in json.load(f)}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _flush(self) -> None:
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        if len(self._signatures) > self.max_signatures:
+            by_age = sorted(self._signatures.values(), key=lambda signature: signature.last_seen or 0)
+            for signature in by_age[:len(self._signatures) - self.max_signatures]:
+                del self._signatures[signature.fingerprint]
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([signature.to_dict() for signature in self._signatures.values()], f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, fingerprint: str) -> Optional[ErrorSignature]:
+        with self._lock:
+            return self._signatures.get(fingerprint)
+
+    def summary(self, fingerprint: str, default: str = "") -> str:
+        """
+        summary() of a signature, or default if it was evicted in the meantime.
+        """
+        with self._lock:
+            signature = self._signatures.get(fingerprint)
+            return signature.summary() if signature is not None else default
+
+    def save(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._flush()
+
+    def _autosave(self) -> None:
+        if self._dirty and time.monotonic() - self._last_flush >= self.autosave_interval:
+            self._flush()
+
+    def _observe(self, message: str, timestamp: Optional[int]) -> Tuple[ErrorSignature, bool]:
+        fingerprint, normalized = fingerprint_message(message)
+        timestamp = timestamp or int(time.time() * 1000)
+        signature = self._signatures.get(fingerprint)
+        is_new = signature is None
+        if is_new:
+            signature = ErrorSignature(fingerprint, normalized, message, first_seen=timestamp)
+            self._signatures[fingerprint] = signature
+        signature.count += 1
+        signature.first_seen = min(signature.first_seen or timestamp, timestamp)
+        signature.last_seen = max(signature.last_seen or timestamp, timestamp)
+        self._dirty = True
+        return signature, is_new
+
+    def observe_event(self, message: str, timestamp: Optional[int] = None) -> Tuple[ErrorSignature, bool]:
+        """
+        Fold a single message into the store and return (signature, is_new).
+        """
+        with self._lock:
+            signature, is_new = self._observe(message, timestamp)
+            self._autosave()
+        return signature, is_new
+
+    def observe(self, events: Iterable[dict]) -> Tuple[List[ErrorSignature], List[ErrorSignature]]:
+        """
+        Fold a batch of events (dicts with "message" and optionally "timestamp") into the
+        store. Returns (new signatures, previously known signatures) touched by the batch.
+        """
+        new, known = {}, {}
+        with self._lock:
+            for event in events:
+                signature, is_new = self._observe(event["message"], event.get("timestamp"))
+                if is_new:
+                    new[signature.fingerprint] = signature
+                elif signature.fingerprint not in new:
+                    known[signature.fingerprint] = signature
+            self._autosave()
+        return list(new.values()), list(known.values())
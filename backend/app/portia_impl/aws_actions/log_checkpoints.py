@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from threading import Lock
+from typing import Optional
+
+DEFAULT_CHECKPOINT_PATH = ".log_checkpoints.json"
+
+
+class LogCheckpointStore:
+    """
+    Persist the tail position of each (log group, log stream) pair so a restarted
+    watcher resumes where it left off instead of rereading the stream.
+
+    Checkpoints are kept in memory and flushed to a small JSON file at most every
+    autosave_interval seconds, and by save(). After a crash a stream is reread from at
+    most that far back, which the error signatures deduplicate. Pass path="" to keep
+    them in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None, autosave_interval: float = 5.0):
+        self.path = os.getenv("LOG_CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH) if path is None else path
+        self.autosave_interval = autosave_interval
+        self._lock = Lock()
+        self._checkpoints = self._load()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _key(log_group_name: str, log_stream_name: str) -> str:
+        return f"{log_group_name}|{log_stream_name}"
+
+    def _load(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A corrupt checkpoint file only costs us a reread, never a crash
+            return {}
+
+    def _flush(self) -> None:
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._checkpoints, f)
+        os.replace(tmp_path, self.path)
+
+    def _autosave(self) -> None:
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.autosave_interval:
+            self._flush()
+
+    def save(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._flush()
+
+    def get(self, log_group_name: str, log_stream_name: str) -> Optional[dict]:
+        with self._lock:
+            checkpoint = self._checkpoints.get(self._key(log_group_name, log_stream_name))
+            return dict(checkpoint) if checkpoint else None
+
+    def set(self, log_group_name: str, log_stream_name: str, next_token: Optional[str], last_timestamp: Optional[int]) -> None:
+        with self._lock:
+            self._checkpoints[self._key(log_group_name, log_stream_name)] = {
+                "next_token": next_token,
+                "last_timestamp": last_timestamp,
+            }
+            self._autosave()
+
+    def clear(self, log_group_name: str, log_stream_name: str) -> None:
+        with self._lock:
+            self._checkpoints.pop(self._key(log_group_name, log_stream_name), None)
+            self._autosave()
@@ -0,0 +1,251 @@
+import heapq
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional
+
+from .aws_client import AWSClient, AWSClientManager
+from .pipeline import BoundedEventQueue, LogEvent, RingBuffer, error_event_pipeline, fingerprint_events
+
+
+class LogWatcher:
+    """
+    Watch many CloudWatch log groups and all of their active streams at once.
+
+    A scheduler thread hands due streams to a bounded thread pool. Each stream is
+    polled at its own interval, which backs off while the stream is quiet and resets
+    as soon as it produces events. Polled events are streamed through the error
+    pipeline and every error lands in one shared bounded queue; the latest ones are
+    also kept in a ring buffer for inspection. Errors are fingerprinted as they are taken
+    off the queue, so a signature only counts as seen once one of its events was
+    actually handed out, not when it was queued and possibly dropped.
+
+    In "filter" mode each log group is a single unit of work: one filter_log_events
+    query covers all of its streams and only matching events leave CloudWatch, along
+    with the lines around each one that make up its multi-line record. In
+    "tail" mode every active stream is tailed on its own and checked locally.
+    """
+
+    def __init__(
+        self,
+        client: AWSClient,
+        log_group_names: Optional[List[str]] = None,
+        poll_interval: float = 5.0,
+        max_poll_interval: float = 60.0,
+        group_intervals: Optional[Dict[str, float]] = None,
+        max_workers: int = 8,
+        active_within: int = 3600,
+        discovery_interval: float = 60.0,
+        queue_maxsize: int = 10000,
+        mode: str = "filter",
+        overflow: str = "block",
+    ):
+        """
+        :param log_group_names: Groups to watch, or None for every group in the account
+        :param group_intervals: Base poll interval per log group, overriding poll_interval
+        :param active_within: Only streams with events in this many seconds are watched
+        :param overflow: "block" to slow polling when the queue is full, "drop_oldest" to shed load
+        """
+        self.client = client
+        self.log_group_names = log_group_names
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.group_intervals = group_intervals or {}
+        self.max_workers = max_workers
+        self.active_within = active_within
+        self.discovery_interval = discovery_interval
+        self.mode = mode
+
+        self.events = BoundedEventQueue(maxsize=queue_maxsize, overflow=overflow)
+        self.recent = RingBuffer(1000)
+
+        self._lock = Lock()
+        self._stop = Event()
+        self._wakeup = Event()
+        self._schedule: list = []
+        # Streams with an entry in _schedule; each stream has one poll chain at a time
+        self._scheduled: set = set()
+        self._streams: Dict[tuple, float] = {}
+        self._in_flight: set = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[Thread] = None
+        self._counters = {"polls": 0, "poll_failures": 0, "events_fetched": 0, "errors_queued": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def watched_streams(self) -> List[tuple]:
+        with self._lock:
+            return sorted(self._streams)
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="log-watcher")
+        self._thread = Thread(target=self._run, name="log-watcher-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def get_error_events(self, timeout: Optional[float] = None, max_events: int = 100) -> List[LogEvent]:
+        """
+        Block until at least one error event is available, then drain up to max_events,
+        fingerprinted. Returns an empty list if timeout expires first.
+        """
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(events) < max_events:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return list(fingerprint_events(events, self.client.signatures))
+
+    def stats(self) -> dict:
+        """
+        Poll and event counters since start, plus the queue's backpressure counters.
+        """
+        with self._lock:
+            stats = dict(self._counters, streams=len(self._streams), in_flight=len(self._in_flight))
+        stats["queue"] = self.events.stats()
+        return stats
+
+    def _base_interval(self, log_group_name: str) -> float:
+        return self.group_intervals.get(log_group_name, self.poll_interval)
+
+    def _discover(self) -> None:
+        log_group_names = self.log_group_names or self.client.list_log_groups()
+        active = set()
+        if self.mode == "filter":
+            active.update((log_group_name, "*") for log_group_name in log_group_names)
+            log_group_names = []
+        for log_group_name in log_group_names:
+            try:
+                streams = self.client.list_active_log_streams(log_group_name, self.active_within)
+            except RuntimeError as e:
+                print(f"Skipping log group {log_group_name}: {e}")
+                continue
+            active.update((log_group_name, stream) for stream in streams)
+
+        now = time.monotonic()
+        with self._lock:
+            for key in active - set(self._streams):
+                self._streams[key] = self._base_interval(key[0])
+                # A stream that went quiet and came back may still be queued or polling,
+                # and that poll reschedules it
+                if key not in self._scheduled and key not in self._in_flight:
+                    self._scheduled.add(key)
+                    heapq.heappush(self._schedule, (now, key))
+            # Streams that went quiet drop out once their in-flight poll finishes
+            for key in set(self._streams) - active:
+                del self._streams[key]
+
+    def _run(self) -> None:
+        next_discovery = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_discovery:
+                try:
+                    self._discover()
+                except Exception as e:
+                    print(f"Log stream discovery failed: {e}")
+                next_discovery = now + self.discovery_interval
+
+            with self._lock:
+                while self._schedule and self._schedule[0][0] <= now:
+                    _, key = heapq.heappop(self._schedule)
+                    self._scheduled.discard(key)
+                    if key not in self._streams or key in self._in_flight:
+                        continue
+                    self._in_flight.add(key)
+                    self._executor.submit(self._poll, key)
+                next_due = self._schedule[0][0] if self._schedule else next_discovery
+
+            # Finished polls set _wakeup so their rescheduled streams are not missed
+            self._wakeup.wait(max(0.0, min(next_due, next_discovery) - time.monotonic()))
+            self._wakeup.clear()
+
+    def _poll(self, key: tuple) -> None:
+        log_group_name, log_stream_name = key
+        fetched = 0
+
+        def counted(raw_events):
+            nonlocal fetched
+            for raw in raw_events:
+                fetched += 1
+                yield raw
+
+        try:
+            if self.mode == "filter":
+                raw_events = self.client.iter_new_filtered_records(log_group_name)
+            else:
+                raw_events = self.client.iter_raw_log_events(log_group_name, log_stream_name, "tail")
+            stream_name = None if log_stream_name == "*" else log_stream_name
+            for event in error_event_pipeline(counted(raw_events), log_group_name, stream_name, self.client.classifier, None):
+                self.recent.append(event)
+                if not self.events.put(event, self._stop):
+                    return
+                with self._lock:
+                    self._counters["errors_queued"] += 1
+        except Exception as e:
+            print(f"Error polling {log_group_name}/{log_stream_name}: {e}")
+            with self._lock:
+                self._counters["poll_failures"] += 1
+        finally:
+            with self._lock:
+                self._counters["polls"] += 1
+                self._counters["events_fetched"] += fetched
+                self._in_flight.discard(key)
+                if key in self._streams:
+                    if fetched:
+                        interval = self._base_interval(log_group_name)
+                    else:
+                        interval = min(self._streams[key] * 2, self.max_poll_interval)
+                    self._streams[key] = interval
+                    if key not in self._scheduled:
+                        self._scheduled.add(key)
+                        heapq.heappush(self._schedule, (time.monotonic() + interval, key))
+            self._wakeup.set()
+
+
+class LogWatcherManager:
+    _watcher: LogWatcher = None
+
+    @classmethod
+    def start(cls, log_group_names: Optional[List[str]] = None, **kwargs) -> LogWatcher:
+        """
+        Start the process-wide watcher, replacing it if it watches a different set of groups.
+        """
+        if cls._watcher is not None:
+            if cls._watcher.is_running and cls._watcher.log_group_names == log_group_names:
+                return cls._watcher
+            cls._watcher.stop(wait=False)
+        cls._watcher = LogWatcher(AWSClientManager.get_client(), log_group_names, **kwargs)
+        cls._watcher.start()
+        return cls._watcher
+
+    @classmethod
+    def get_watcher(cls) -> LogWatcher:
+        if cls._watcher is None:
+            raise RuntimeError("Log watcher has not been started. Call start() first.")
+        return cls._watcher
+
+    @classmethod
+    def stop(cls) -> None:
+        if cls._watcher is not None:
+            cls._watcher.stop(wait=False)
+            cls._watcher = None
@@ -0,0 +1,188 @@
+import queue
+import time
+from collections import deque
+from threading import Event, Lock
+from typing import Iterable, Iterator, List, Optional
+
+from .error_classifier import ErrorClassifier
+from .fingerprint import SignatureStore
+
+
+class LogEvent:
+    """
+    Compact record for one log event as it moves through the pipeline.
+    """
+
+    __slots__ = (
+        "log_group_name",
+        "log_stream_name",
+        "timestamp",
+        "message",
+        "event_id",
+        "severity",
+        "category",
+        "fingerprint",
+        "is_new",
+    )
+
+    def __init__(self, log_group_name: str, log_stream_name: Optional[str], timestamp: int, message: str, event_id: Optional[str] = None):
+        self.log_group_name = log_group_name
+        self.log_stream_name = log_stream_name
+        self.timestamp = timestamp
+        self.message = message
+        self.event_id = event_id
+        self.severity = None
+        self.category = None
+        self.fingerprint = None
+        self.is_new = False
+
+    def __repr__(self) -> str:
+        return f"LogEvent({self.log_group_name}/{self.log_stream_name} @ {self.timestamp}: {self.message[:80]!r})"
+
+
+def parse_events(raw_events: Iterable[dict], log_group_name: str, log_stream_name: Optional[str] = None) -> Iterator[LogEvent]:
+    for raw in raw_events:
+        yield LogEvent(
+            log_group_name,
+            raw.get("logStreamName", log_stream_name),
+            raw["timestamp"],
+            raw["message"],
+            raw.get("eventId"),
+        )
+
+
+def classify_events(events: Iterable[LogEvent], classifier: ErrorClassifier) -> Iterator[LogEvent]:
+    """
+    Drop events that are not errors and tag the rest with severity and category.
+    """
+    for event in events:
+        classification = classifier.classify(event.message)
+        if classification is None:
+            continue
+        event.severity = classification.severity
+        event.category = classification.category
+        yield event
+
+
+def fingerprint_events(events: Iterable[LogEvent], signatures: SignatureStore) -> Iterator[LogEvent]:
+    for event in events:
+        signature, event.is_new = signatures.observe_event(event.message, event.timestamp)
+        event.fingerprint = signature.fingerprint
+        yield event
+
+
+def error_event_pipeline(raw_events: Iterable[dict], log_group_name: str, log_stream_name: Optional[str], classifier: ErrorClassifier, signatures: Optional[SignatureStore]) -> Iterator[LogEvent]:
+    """
+    fetch -> parse -> classify -> fingerprint, one event at a time.
+
+    Nothing is buffered between stages, so memory use is bounded by a single fetched page
+    regardless of how many events flow through. Fingerprinting marks a signature as seen,
+    so consumers that may still lose an event (a queue that drops) pass signatures=None
+    and fingerprint what they actually deliver with fingerprint_events.
+    """
+    events = classify_events(parse_events(raw_events, log_group_name, log_stream_name), classifier)
+    if signatures is None:
+        return events
+    return fingerprint_events(events, signatures)
+
+
+class RingBuffer:
+    """
+    Thread-safe fixed-size buffer of the most recent items.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self._items = deque(maxlen=capacity)
+        self._lock = Lock()
+
+    def append(self, item) -> None:
+        with self._lock:
+            self._items.append(item)
+
+    def recent(self, limit: Optional[int] = None) -> List:
+        with self._lock:
+            items = list(self._items)
+        return items if limit is None else items[-limit:]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class BoundedEventQueue:
+    """
+    Bounded hand-off between producers (pollers) and consumers.
+
+    With overflow="block" a producer waits for space, which slows polling down to the
+    consumer's pace. With overflow="drop_oldest" producers never wait and the oldest
+    queued events are discarded instead. Both cases are counted so a lagging consumer
+    shows up in stats().
+    """
+
+    def __init__(self, maxsize: int = 10000, overflow: str = "block"):
+        if overflow not in ("block", "drop_oldest"):
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._lock = Lock()
+        self.dropped = 0
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+
+    def put(self, event: LogEvent, stop: Optional[Event] = None) -> bool:
+        """
+        Queue event. Returns False if stop was set while waiting for space, in which
+        case the event was not queued.
+        """
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == "drop_oldest":
+            while True:
+                try:
+                    self._queue.get_nowait()
+                    with self._lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(event)
+                    return True
+                except queue.Full:
+                    continue
+
+        start = time.monotonic()
+        queued = False
+        while not queued and not (stop is not None and stop.is_set()):
+            try:
+                # Wake up now and then so a stop is noticed while nobody drains the queue
+                self._queue.put(event, timeout=0.1 if stop is not None else None)
+                queued = True
+            except queue.Full:
+                continue
+        with self._lock:
+            self.blocked += 1
+            self.blocked_seconds += time.monotonic() - start
+        return queued
+
+    def get(self, timeout: Optional[float] = None) -> LogEvent:
+        return self._queue.get(timeout=timeout)
+
+    def get_nowait(self) -> LogEvent:
+        return self._queue.get_nowait()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "maxsize": self.maxsize,
+                "dropped": self.dropped,
+                "blocked": self.blocked,
+                "blocked_seconds": round(self.blocked_seconds, 3),
+            }
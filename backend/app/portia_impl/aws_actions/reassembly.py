@@ -0,0 +1,132 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional
+
+DEFAULT_START_PATTERNS = [
+    r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}",  # 2025-01-21 17:43:25 / ISO timestamps
+    r"^\[\d{4}-\d{2}-\d{2}",  # [2025-01-21 ...]
+    r"^\[?(?:TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b",
+    r"^(?:START|END|REPORT|INIT_START) RequestId:",  # Lambda runtime lines
+    r"^\{",  # structured JSON logs are always one event per record
+]
+
+DEFAULT_CONTINUATION_PATTERNS = [
+    r"^\s",  # indented stack frames and code lines
+    r"^Traceback \(most recent call last\)",
+    r"^During handling of the above exception",
+    r"^The above exception was the direct cause",
+    r"^Caused by:",
+    r"^[\w.]*(?:Error|Exception|Warning)\b",  # final "ValueError: ..." line
+    r"^\.\.\. \d+ more",
+]
+
+
+class _OpenRecord:
+    __slots__ = ("first", "lines", "size", "last_timestamp", "updated_at")
+
+    def __init__(self, first: dict, now: float):
+        self.first = first
+        self.lines = [first["message"].rstrip("\n")]
+        self.size = len(first["message"])
+        self.last_timestamp = first["timestamp"]
+        self.updated_at = now
+
+
+class MultilineReassembler:
+    """
+    Join log events that CloudWatch split line by line back into logical records.
+
+    Each stream has at most one open record. An event continues the open record when
+    it matches a continuation pattern (and no start pattern) and arrived within
+    max_gap_ms of the previous line; anything else starts a new record, so unrelated
+    single-line errors are never glued together. Records are emitted when the next
+    record starts, when they reach max_lines / max_bytes, or once no line was added for
+    flush_timeout seconds. At most max_streams records are held open; the least
+    recently updated is flushed to make room.
+
+    Not thread-safe: use one instance per poller.
+    """
+
+    def __init__(
+        self,
+        start_patterns: Optional[List[str]] = None,
+        continuation_patterns: Optional[List[str]] = None,
+        max_gap_ms: int = 1000,
+        flush_timeout: float = 2.0,
+        max_lines: int = 200,
+        max_bytes: int = 64 * 1024,
+        max_streams: int = 1000,
+    ):
+        self._start = re.compile("|".join(f"(?:{p})" for p in start_patterns or DEFAULT_START_PATTERNS))
+        self._continuation = re.compile("|".join(f"(?:{p})" for p in continuation_patterns or DEFAULT_CONTINUATION_PATTERNS))
+        self.max_gap_ms = max_gap_ms
+        self.flush_timeout = flush_timeout
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.max_streams = max_streams
+        self._open: "OrderedDict[str, _OpenRecord]" = OrderedDict()
+
+    def _is_continuation(self, record: _OpenRecord, event: dict) -> bool:
+        if event["timestamp"] - record.last_timestamp > self.max_gap_ms:
+            return False
+        if record.first["message"].lstrip().startswith("{"):
+            return False
+        message = event["message"]
+        return bool(self._continuation.match(message)) and not self._start.match(message)
+
+    @staticmethod
+    def _emit(record: _OpenRecord) -> dict:
+        event = dict(record.first)
+        event["message"] = "\n".join(record.lines)
+        return event
+
+    def feed(self, events: Iterable[dict], log_stream_name: Optional[str] = None) -> Iterator[dict]:
+        """
+        Consume raw events and yield every record that is complete.
+        """
+        for event in events:
+            stream = event.get("logStreamName", log_stream_name) or ""
+            now = time.monotonic()
+            record = self._open.get(stream)
+
+            if record is not None and self._is_continuation(record, event):
+                message = event["message"].rstrip("\n")
+                if len(record.lines) < self.max_lines and record.size + len(message) <= self.max_bytes:
+                    record.lines.append(message)
+                    record.size += len(message)
+                    record.last_timestamp = event["timestamp"]
+                    record.updated_at = now
+                    self._open.move_to_end(stream)
+                    continue
+
+            if record is not None:
+                yield self._emit(self._open.pop(stream))
+            self._open[stream] = _OpenRecord(event, now)
+
+            while len(self._open) > self.max_streams:
+                _, oldest = self._open.popitem(last=False)
+                yield self._emit(oldest)
+
+    def flush(self, expired_only: bool = True) -> Iterator[dict]:
+        """
+        Yield open records, only those idle for flush_timeout unless expired_only=False.
+        """
+        now = time.monotonic()
+        for stream in list(self._open):
+            if not expired_only or now - self._open[stream].updated_at >= self.flush_timeout:
+                yield self._emit(self._open.pop(stream))
+
+    def reassemble(self, events: Iterable[dict], log_stream_name: Optional[str] = None) -> Iterator[dict]:
+        """
+        feed() followed by flush() of the records that timed out, for one poll's events.
+
+        A record still open after this poll waits for the next one, since its remaining
+        lines may not have been ingested yet.
+        """
+        yield from self.feed(events, log_stream_name)
+        yield from self.flush()
+
+    @property
+    def open_records(self) -> int:
+        return len(self._open)
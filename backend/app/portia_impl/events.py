@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, defaultdict, deque
+from threading import Lock
+from typing import Dict, List, Optional
+
+# Tool outputs are cut to this many characters in events
+MAX_EVENT_VALUE_LENGTH = 2000
+
+FINISHED_STATES = ("COMPLETE", "FAILED")
+
+
+class Subscription:
+    """
+    Events of one topic for one asyncio consumer; iterate it with `async for`.
+
+    At most maxsize events wait for the consumer. One that falls further behind is
+    unsubscribed and marked overflowed once it has read what was queued; it catches up
+    by subscribing again with the last id it saw.
+    """
+
+    def __init__(self, broker: "EventBroker", topic: str, loop: asyncio.AbstractEventLoop, maxsize: int = 1000):
+        self.broker = broker
+        self.topic = topic
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def _deliver(self, event: dict) -> None:
+        # Called from the publishing thread
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict) -> None:
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            self.close()
+
+    @property
+    def overflowed(self) -> bool:
+        """
+        Whether events were dropped and everything queued before that was read.
+        """
+        return self.dropped and self.queue.empty()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        The next event, or None if none arrives within timeout.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if self.overflowed:
+            raise StopAsyncIteration
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.broker._unsubscribe(self)
+
+
+class EventBroker:
+    """
+    In-process publish / subscribe of plan progress.
+
+    Publishers are plain threads (the plan runner's); subscribers are coroutines, each
+    with its own queue fed through the event loop. Every event gets an increasing id,
+    and the last history events of each topic are kept, so a subscriber that connects
+    late, or reconnects with the last id it saw, misses nothing recent. History is
+    dropped for the least recently published topics beyond max_topics. Each subscriber
+    queues at most queue_size events (see Subscription).
+    """
+
+    def __init__(self, history: int = 200, max_topics: int = 1000, queue_size: int = 1000):
+        self.history = history
+        self.max_topics = max_topics
+        # Room for the whole history a new subscriber starts with
+        self.queue_size = max(queue_size, history)
+        self._lock = Lock()
+        self._ids = itertools.count(1)
+        self._recent: "OrderedDict[str, deque]" = OrderedDict()
+        self._subscribers: Dict[str, List[Subscription]] = defaultdict(list)
+
+    def publish(self, topic: str, event: dict) -> dict:
+        with self._lock:
+            event = {"id": next(self._ids), "topic": topic, "time": time.time(), **event}
+            recent = self._recent.get(topic)
+            if recent is None:
+                recent = self._recent[topic] = deque(maxlen=self.history)
+                while len(self._recent) > self.max_topics:
+                    self._recent.popitem(last=False)
+            self._recent.move_to_end(topic)
+            recent.append(event)
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription._deliver(event)
+        return event
+
+    def subscribe(self, topic: str, after_id: int = 0) -> Subscription:
+        """
+        Subscribe from the running event loop. Kept events newer than after_id are
+        delivered first.
+        """
+        subscription = Subscription(self, topic, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            for event in self._recent.get(topic, ()):
+                if event["id"] > after_id:
+                    subscription.queue.put_nowait(event)
+            self._subscribers[topic].append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.topic, None)
+
+    def recent(self, topic: str) -> List[dict]:
+        with self._lock:
+            return list(self._recent.get(topic, ()))
+
+
+def _state(plan_run) -> str:
+    state = getattr(plan_run, "state", None)
+    return str(getattr(state, "value", state))
+
+
+def _clip(value) -> str:
+    value = str(getattr(value, "value", value))
+    if len(value) <= MAX_EVENT_VALUE_LENGTH:
+        return value
+    return value[:MAX_EVENT_VALUE_LENGTH] + " ..."
+
+
+def plan_run_events(previous, current, steps: Optional[list] = None) -> List[dict]:
+    """
+    What happened between two saves of a plan run: step started / completed, tool
+    output, clarification raised / resolved, and run state changes. previous is None
+    for the first save. steps (the plan's) adds each step's task to its events.
+    """
+    def step_event(kind, index):
+        event = {"type": kind, "step": index}
+        if steps is not None and 0 <= index < len(steps):
+            event["task"] = getattr(steps[index], "task", None)
+        return event
+
+    events = []
+    state = _state(current)
+    previous_state = _state(previous) if previous is not None else None
+    if previous is None:
+        events.append({"type": "run_started", "plan_run_id": str(current.id), "plan_id": str(current.plan_id), "state": state})
+
+    outputs = current.outputs
+    previous_outputs = previous.outputs if previous is not None else None
+    previous_step_outputs = previous_outputs.step_outputs if previous_outputs is not None else {}
+    for name, output in outputs.step_outputs.items():
+        if name not in previous_step_outputs:
+            events.append({"type": "tool_output", "output": name, "value": _clip(output)})
+
+    index = current.current_step_index
+    previous_index = previous.current_step_index if previous is not None else None
+    if previous_index is not None:
+        # Everything before the current step is done, and the current one too once the
+        # run completed
+        last_done = index if state == "COMPLETE" and previous_state != "COMPLETE" else index - 1
+        for done in range(previous_index, last_done + 1):
+            events.append(step_event("step_completed", done))
+    if state not in FINISHED_STATES and index != previous_index:
+        events.append(step_event("step_started", index))
+
+    previous_clarifications = {
+        str(clarification.id): clarification
+        for clarification in (previous_outputs.clarifications if previous_outputs is not None else [])
+    }
+    for clarification in outputs.clarifications:
+        before = previous_clarifications.get(str(clarification.id))
+        if before is None and not clarification.resolved:
+            events.append({
+                "type": "clarification",
+                "clarification_id": str(clarification.id),
+                "step": getattr(clarification, "step", None),
+                "user_guidance": clarification.user_guidance,
+                "options": getattr(clarification, "options", None),
+            })
+        elif clarification.resolved and (before is None or not before.resolved):
+            events.append({"type": "clarification_resolved", "clarification_id": str(clarification.id), "response": _clip(clarification.response)})
+
+    if state != previous_state and previous_state is not None:
+        events.append({"type": "run_state", "state": state})
+    if state in FINISHED_STATES and state != previous_state:
+        final_output = outputs.final_output
+        events.append({"type": "run_finished", "state": state, "final_output": _clip(final_output) if final_output is not None else None})
+    return events
+
+
+plan_events = EventBroker()
@@ -1,3 +1,9 @@
 from .github_tools import *
 from .github_client import *
-from .github_client_manager import *
\ No newline at end of file
+from .github_client_manager import *
+from .http_cache import *
+from .path_index import *
+from .rate_limiter import *
+from .async_github_client import *
+from .repo_mirror import *
+from .symbol_index import *
@@ -0,0 +1,170 @@
+import asyncio
+import base64
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from .github_client import DEFAULT_TIMEOUT, RAW_MEDIA_TYPE, RETRY_STATUSES
+from .http_cache import ConditionalCache
+from .rate_limiter import DEFAULT_SCHEDULER, PRIORITY_READ, PRIORITY_WRITE
+
+
+class AsyncGitHubClient:
+    """
+    Async counterpart of GitHubClient's read methods, for code running on the event loop.
+
+    Requests share one httpx connection pool and go through the same conditional cache
+    and rate-limit scheduler as the synchronous client, so both count against one
+    budget. read_files fetches many files concurrently, at most max_concurrency at a
+    time.
+    """
+
+    def __init__(self, token, username, timeout=DEFAULT_TIMEOUT, max_retries=3, backoff_factor=0.5, max_connections=10, cache=None, scheduler=None):
+        self.base_url = "https://api.github.com"
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        self.username = username
+        self.token = token
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.http = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.cache = cache if cache is not None else ConditionalCache()
+        self._cache_namespace = hashlib.sha1(str(token).encode()).hexdigest()[:12]
+        self.scheduler = scheduler or DEFAULT_SCHEDULER
+        self._scheduler_key = self.scheduler.token_key(self.headers["Authorization"])
+
+    async def __aenter__(self) -> "AsyncGitHubClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def request(self, method, url, priority=None, **kwargs) -> httpx.Response:
+        """
+        Send a request through the scheduler, retrying 5xx responses of idempotent
+        methods with exponential backoff and requeueing rate-limited ones.
+        """
+        if priority is None:
+            priority = PRIORITY_READ if method in ("GET", "HEAD") else PRIORITY_WRITE
+        server_errors = rate_limits = 0
+        while True:
+            await self._acquire(priority)
+            response = None
+            try:
+                response = await self.http.request(method, url, **kwargs)
+            finally:
+                rate_limited = self.scheduler.release(self._scheduler_key, _ResponseView(response) if response is not None else None)
+
+            if rate_limited and rate_limits < self.max_retries:
+                rate_limits += 1
+                continue
+            if response.status_code in RETRY_STATUSES and method in ("GET", "HEAD", "PUT", "DELETE") and server_errors < self.max_retries:
+                await asyncio.sleep(self.backoff_factor * 2 ** server_errors)
+                server_errors += 1
+                continue
+            return response
+
+    async def _acquire(self, priority) -> None:
+        # acquire() blocks while the token is throttled; keep that off the event loop
+        acquired = asyncio.ensure_future(asyncio.to_thread(self.scheduler.acquire, self._scheduler_key, priority))
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The thread goes on to take the slot; hand it back once it has
+            def release(future):
+                if not future.cancelled() and future.exception() is None:
+                    self.scheduler.release(self._scheduler_key, None)
+
+            acquired.add_done_callback(release)
+            raise
+
+    async def get_json(self, url, params=None):
+        """
+        GET a JSON resource through the conditional cache (see GitHubClient.get_json).
+        """
+        query = "&".join(f"{key}={value}" for key, value in sorted((params or {}).items()))
+        key = f"{self._cache_namespace} {url}?{query}"
+        response = await self.request("GET", url, params=params, headers=self.cache.validators(key))
+        if response.status_code == 304:
+            if key in self.cache:
+                return self.cache.hit(key)["body"]
+            response = await self.request("GET", url, params=params)
+        response.raise_for_status()
+        body = response.json()
+        self.cache.store(key, body, response.headers.get("ETag"), response.headers.get("Last-Modified"), dict(response.links))
+        return body
+
+    async def list_files(self, owner, repo, path=""):
+        url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
+        return [item['name'] for item in await self.get_json(url)]
+
+    async def _decode_content(self, url, data) -> str:
+        # Files over 1 MB come without their content ("encoding": "none"); fetch those raw
+        if data.get("encoding") == "base64":
+            return base64.b64decode(data['content']).decode()
+        response = await self.request("GET", url, headers={"Accept": RAW_MEDIA_TYPE})
+        response.raise_for_status()
+        return response.content.decode()
+
+    async def read_file(self, owner, repo, path):
+        url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
+        return await self._decode_content(url, await self.get_json(url))
+
+    async def get_file_metadata_and_content(self, owner, repo, path):
+        owner = owner or self.username
+        url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
+        data = await self.get_json(url)
+        return {
+            "name": data['name'],
+            "path": data['path'],
+            "sha": data['sha'],
+            "content": await self._decode_content(url, data)
+        }
+
+    async def read_files(self, owner, repo, paths: Iterable[str], max_concurrency: int = 8) -> Dict[str, Optional[str]]:
+        """
+        Read many files concurrently. Returns {path: content}, with None for files that
+        could not be read (missing, a directory, or not text).
+        """
+        owner = owner or self.username
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def read(path):
+            async with semaphore:
+                try:
+                    return await self.read_file(owner, repo, path)
+                except (httpx.HTTPStatusError, AttributeError, KeyError, TypeError, UnicodeDecodeError):
+                    return None
+
+        paths: List[str] = list(dict.fromkeys(paths))
+        contents = await asyncio.gather(*(read(path) for path in paths))
+        return dict(zip(paths, contents))
+
+
+class _ResponseView:
+    """
+    The parts of a requests.Response the scheduler reads, backed by an httpx.Response.
+    """
+
+    __slots__ = ("status_code", "headers", "_response")
+
+    def __init__(self, response: httpx.Response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self._response = response
+
+    @property
+    def text(self) -> str:
+        return self._response.text
@@ -1,13 +1,69 @@
-import requests
 import base64
+import codecs
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+from requests import HTTPError, Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .http_cache import ConditionalCache
+from .path_index import PathIndexCache, RepoPathIndex
+from .rate_limiter import PRIORITY_SPECULATIVE, RateLimitedSession
+from .symbol_index import SymbolIndexCache
+
+# (connect, read) timeout in seconds for every GitHub API call
+DEFAULT_TIMEOUT = (5, 30)
+
+# Statuses worth retrying: GitHub answers these for transient server-side failures
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Contents API media type returning the file itself instead of base64 inside JSON;
+# unlike the JSON form it also serves files between 1 and 100 MB
+RAW_MEDIA_TYPE = "application/vnd.github.raw"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def create_session(max_retries=3, backoff_factor=0.5, pool_maxsize=10, scheduler=None):
+    """
+    Create a keep-alive session with a connection pool, retries with exponential
+    backoff (backoff_factor * 2 ** (retry - 1) seconds) and rate limiting.
+
+    5xx responses are only retried for idempotent methods, so a POST that may have gone
+    through is not repeated. Rate limits (403/429) are left to the scheduler, which
+    queues the request and every other request of the token until the limit lifts.
+    """
+    retry = Retry(
+        total=max_retries,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=backoff_factor,
+        # Hand the final response back so raise_for_status reports the real status
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = RateLimitedSession(scheduler)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 class GitHubClient:
-    def __init__(self, token, username):
+    def __init__(self, token, username, timeout=DEFAULT_TIMEOUT, max_retries=3, backoff_factor=0.5, pool_maxsize=10, cache=None, path_indexes=None, scheduler=None, mirror=None, symbol_indexes=None):
         """
         Initialize the GitHub client.
 
         :param token: GitHub personal access token
         :param username: Your GitHub username
+        :param timeout: Seconds, or a (connect, read) tuple, before a call is abandoned
+        :param max_retries: Retries for 5xx responses
+        :param backoff_factor: Base of the exponential delay between retries
+        :param pool_maxsize: Connections kept open to api.github.com
+        :param cache: ConditionalCache for read requests, shared between clients
+        :param path_indexes: PathIndexCache of repository trees, shared between clients
+        :param scheduler: GitHubRequestScheduler, the process-wide one by default
+        :param mirror: RepoMirror to serve list_files and read_file from local snapshots
+        :param symbol_indexes: SymbolIndexCache over mirrored snapshots, shared between clients
         """
         self.base_url = "https://api.github.com"
         self.headers = {
@@ -16,52 +72,335 @@ class GitHubClient:
         }
         self.username = username
         self.token = token
+        self.timeout = timeout
+
+        # All calls share one session so connections (and TLS handshakes) are reused
+        self.session = create_session(max_retries, backoff_factor, pool_maxsize, scheduler)
+        self.session.headers.update(self.headers)
+
+        self.cache = cache if cache is not None else ConditionalCache()
+        # Cached responses are only served back to the token that fetched them
+        self._cache_namespace = hashlib.sha1(str(token).encode()).hexdigest()[:12]
+        self.path_indexes = path_indexes if path_indexes is not None else PathIndexCache()
+        self.mirror = mirror
+        self.symbol_indexes = symbol_indexes if symbol_indexes is not None else SymbolIndexCache()
+
+    def get_json(self, url, params=None):
+        """
+        GET a JSON resource through the conditional cache.
+
+        A cached resource is revalidated with If-None-Match / If-Modified-Since and its
+        body reused on 304, so unchanged resources cost no rate limit.
+        """
+        return self.get_json_page(url, params)[0]
+
+    def get_json_page(self, url, params=None):
+        """
+        get_json for paginated resources: returns (body, links), links being the parsed
+        Link header ({"next": {"url": ...}, "last": {...}}).
+        """
+        query = "&".join(f"{key}={value}" for key, value in sorted((params or {}).items()))
+        key = f"{self._cache_namespace} {url}?{query}"
+        response = self.session.get(url, params=params, headers=self.cache.validators(key), timeout=self.timeout)
+        if response.status_code == 304:
+            if key in self.cache:
+                entry = self.cache.hit(key)
+                return entry["body"], entry["links"]
+            # Evicted since the validators were read: fetch it unconditionally
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        self.cache.store(key, body, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.links)
+        return body, response.links
+
+    def iter_repository_pages(self, user=None, org=None, per_page=100, max_workers=8):
+        """
+        Stream every repository of a user (or an organization), one list per page as
+        GitHub returns them.
+
+        The first page's Link header tells how many pages there are; the remaining pages
+        are then fetched concurrently and yielded in order, so callers can start on the
+        first repositories before the last page has arrived.
+        """
+        if org:
+            url = f"{self.base_url}/orgs/{org}/repos"
+        else:
+            url = f"{self.base_url}/users/{user or self.username}/repos"
+
+        repos, links = self.get_json_page(url, {"per_page": per_page, "page": 1})
+        yield repos
+
+        last_page = _link_page(links, "last")
+        if last_page is None:
+            # No "last" relation: follow "next" one page at a time
+            page = 1
+            while "next" in links:
+                page += 1
+                repos, links = self.get_json_page(url, {"per_page": per_page, "page": page})
+                yield repos
+            return
+
+        def fetch_page(page):
+            return self.get_json_page(url, {"per_page": per_page, "page": page})[0]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(fetch_page, range(2, last_page + 1))
+
+    def iter_repositories(self, user=None, org=None, per_page=100, max_workers=8):
+        """
+        iter_repository_pages, one repository at a time.
+        """
+        for repos in self.iter_repository_pages(user, org, per_page, max_workers):
+            yield from repos
 
     def list_repositories(self, user=None):
         """
         List repositories for a user or the authenticated account.
         """
-        user = user or self.username
-        url = f"{self.base_url}/users/{user}/repos"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return [repo['name'] for repo in response.json()]
+        return [repo['name'] for repo in self.iter_repositories(user)]
 
-    def list_files(self, owner, repo, path=""):
+    def list_files(self, owner, repo, path="", recursive=False):
         """
         List files in a repository at a given path.
+
+        With recursive=True every file below path is returned as a repository path,
+        answered from the repository's path index instead of one call per directory.
         """
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return [item['name'] for item in response.json()]
+        if self.mirror is not None:
+            try:
+                return self.mirror.list_files(self, owner, repo, path, recursive)
+            except (FileNotFoundError, NotADirectoryError):
+                raise _not_found(url) from None
+        if recursive:
+            return self.get_path_index(owner, repo).list_directory(path)
+        return [item['name'] for item in self.get_json(url)]
 
     def read_file(self, owner, repo, path):
         """
         Read a file's content from a repository.
+
+        Files up to 1 MB come base64-encoded in the (cached) contents JSON; GitHub leaves
+        the content of bigger ones out, and those are streamed as raw bytes instead.
         """
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        content = response.json()
-        return base64.b64decode(content['content']).decode()
+        if self.mirror is not None:
+            try:
+                return self.mirror.read_file(self, owner, repo, path)
+            except (FileNotFoundError, NotADirectoryError):
+                raise _not_found(url) from None
+        content = self.get_json(url)
+        if content.get('encoding') == 'base64':
+            return base64.b64decode(content['content']).decode()
+        return _decode(self.iter_file_chunks(owner, repo, path))
 
-    def get_file_metadata_and_content(self, owner, repo, path):
+    def iter_file_chunks(self, owner, repo, path, chunk_size=STREAM_CHUNK_SIZE):
         """
-        Get file metadata and content.
+        Stream a file's bytes in chunks of up to chunk_size, from the mirror or the raw
+        contents API. Closing the generator early stops the download.
         """
-        owner = owner or self.username
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-        response = requests.get(url, headers=self.headers)
+        if self.mirror is not None:
+            try:
+                f = self.mirror.open_file(self, owner, repo, path)
+            except (FileNotFoundError, NotADirectoryError):
+                raise _not_found(url) from None
+            with f:
+                yield from iter(lambda: f.read(chunk_size), b"")
+            return
+        with self.session.get(url, headers={"Accept": RAW_MEDIA_TYPE}, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            yield from response.iter_content(chunk_size=chunk_size)
+
+    def iter_file_lines(self, owner, repo, path):
+        """
+        Stream a file's lines (without line endings), decoding it as UTF-8 as it arrives.
+        """
+        return _iter_lines(self.iter_file_chunks(owner, repo, path))
+
+    def read_file_lines(self, owner, repo, path, start_line, end_line, max_line_length=None):
+        """
+        Read lines start_line..end_line (1-based, inclusive) of a file, each prefixed
+        with its line number. Only that window is kept in memory and the download stops
+        after end_line. Lines longer than max_line_length (minified code) are cut short.
+        """
+        start_line = max(1, start_line)
+        window = []
+        lines = self.iter_file_lines(owner, repo, path)
+        try:
+            for number, line in enumerate(lines, 1):
+                if number > end_line:
+                    break
+                if number >= start_line:
+                    window.append(f"{number}: {_clip(line, max_line_length)}")
+        finally:
+            lines.close()
+        return "\n".join(window)
+
+    def read_file_snippet(self, owner, repo, path, max_chars=20000, start_line=1, max_line_length=500):
+        """
+        Bounded read for prompts: numbered lines from start_line until max_chars, with a
+        closing note naming the next line when the file goes on.
+        """
+        return _snippet(self.iter_file_lines(owner, repo, path), max_chars, start_line, max_line_length)
+
+    def read_file_bounded(self, owner, repo, path, max_chars=20000):
+        """
+        The whole file if it fits in max_chars, otherwise read_file_snippet's bounded,
+        line-numbered start of it. Never reads much more than max_chars either way.
+        """
+        return _read_bounded(self.iter_file_chunks(owner, repo, path), max_chars)[0]
+
+    def get_commit_sha(self, owner, repo, ref="HEAD", priority=None):
+        """
+        Resolve a branch, tag or "HEAD" to its commit sha.
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/commits/{ref}"
+        response = self.session.get(url, headers={"Accept": "application/vnd.github.sha"}, timeout=self.timeout, priority=priority)
+        response.raise_for_status()
+        return response.text.strip()
+
+    def download_tarball(self, owner, repo, ref, fileobj):
+        """
+        Stream the tarball of a repository at ref into a binary file object.
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/tarball/{ref}"
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                fileobj.write(chunk)
+
+    def compare_commits(self, owner, repo, base, head):
+        """
+        Paths added, modified, removed or renamed (both names) between two commits, or
+        None when the comparison is too large for GitHub to list every file.
+        """
+        data = self.get_json(f"{self.base_url}/repos/{owner}/{repo}/compare/{base}...{head}")
+        files = data.get("files", [])
+        # GitHub lists at most 300 files per comparison
+        if len(files) >= 300:
+            return None
+        paths = []
+        for item in files:
+            paths.append(item["filename"])
+            if item.get("previous_filename"):
+                paths.append(item["previous_filename"])
+        return paths
+
+    def get_symbol_index(self, owner, repo):
+        """
+        Symbol index of the repository's head, built from its mirrored snapshot.
+        """
+        return self.symbol_indexes.get(self, owner or self.username, repo)
+
+    def get_tree_paths(self, owner, repo, sha):
+        """
+        Paths of every file in the tree of a commit, using one recursive Git Trees call.
+
+        GitHub truncates recursive listings of very large trees; those are walked one
+        directory level at a time instead. Listings only help find a file, so they go
+        at speculative priority, behind the reads and writes of plan steps.
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{sha}"
+        response = self.session.get(url, params={"recursive": 1}, timeout=self.timeout, priority=PRIORITY_SPECULATIVE)
         response.raise_for_status()
         data = response.json()
-        content = base64.b64decode(data['content']).decode()
-        return {
+        if not data.get("truncated"):
+            return [item["path"] for item in data["tree"] if item["type"] == "blob"]
+
+        paths = []
+        pending = [("", sha)]
+        while pending:
+            prefix, tree_sha = pending.pop()
+            response = self.session.get(f"{self.base_url}/repos/{owner}/{repo}/git/trees/{tree_sha}", timeout=self.timeout, priority=PRIORITY_SPECULATIVE)
+            response.raise_for_status()
+            for item in response.json()["tree"]:
+                path = f"{prefix}{item['path']}"
+                if item["type"] == "blob":
+                    paths.append(path)
+                elif item["type"] == "tree":
+                    pending.append((path + "/", item["sha"]))
+        return paths
+
+    def get_tree_modes(self, owner, repo, tree_sha, paths):
+        """
+        File mode ("100644", "100755", "120000", ...) of each of paths that is a file in
+        a tree; paths not in the tree are left out.
+
+        One recursive Git Trees call; if GitHub truncates it, only the directories
+        leading to paths are listed, one level at a time.
+        """
+        wanted = set(paths)
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{tree_sha}"
+        response = self.session.get(url, params={"recursive": 1}, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get("truncated"):
+            return {item["path"]: item["mode"] for item in data["tree"] if item["type"] == "blob" and item["path"] in wanted}
+
+        directories = {path.rsplit("/", 1)[0] + "/" for path in wanted if "/" in path}
+        modes = {}
+        pending = [("", tree_sha)]
+        while pending:
+            prefix, sha = pending.pop()
+            response = self.session.get(f"{self.base_url}/repos/{owner}/{repo}/git/trees/{sha}", timeout=self.timeout)
+            response.raise_for_status()
+            for item in response.json()["tree"]:
+                path = f"{prefix}{item['path']}"
+                if item["type"] == "blob" and path in wanted:
+                    modes[path] = item["mode"]
+                elif item["type"] == "tree" and any(directory.startswith(path + "/") for directory in directories):
+                    pending.append((path + "/", item["sha"]))
+        return modes
+
+    def get_path_index(self, owner, repo, ref="HEAD"):
+        """
+        Path index of a repository at ref. Indexes are cached per commit sha, so an
+        unchanged repository costs one sha lookup instead of a new listing.
+        """
+        owner = owner or self.username
+        sha = self.get_commit_sha(owner, repo, ref, PRIORITY_SPECULATIVE)
+        index = self.path_indexes.get(owner, repo, sha)
+        if index is None:
+            index = RepoPathIndex(self.get_tree_paths(owner, repo, sha), sha)
+            self.path_indexes.put(owner, repo, index)
+        return index
+
+    def find_repo_path(self, owner, repo, frame_path):
+        """
+        Map a path from a stack trace (e.g. /var/task/app/handlers/pay.py) to the
+        repository path it was deployed from, preferring the longest matching suffix.
+        """
+        return self.get_path_index(owner, repo).resolve(frame_path)
+
+    def get_file_metadata_and_content(self, owner, repo, path, max_chars=None):
+        """
+        Get file metadata and content. With max_chars, files bigger than that come with
+        read_file_bounded's snippet as content and "truncated" set.
+        """
+        owner = owner or self.username
+        url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
+        data = self.get_json(url)
+        truncated = False
+        if data.get('encoding') == 'base64':
+            # Up to 1 MB the content is already in the JSON
+            chunks = iter([base64.b64decode(data['content'])])
+        else:
+            chunks = self.iter_file_chunks(owner, repo, path)
+        if max_chars is not None:
+            content, truncated = _read_bounded(chunks, max_chars)
+        else:
+            content = _decode(chunks)
+        result = {
             "name": data['name'],
             "path": data['path'],
             "sha": data['sha'],
+            "size": data.get('size'),
             "content": content
         }
+        if max_chars is not None:
+            result["truncated"] = truncated
+        return result
 
     def create_issue(self, owner, repo, title, body=None):
         """
@@ -70,7 +409,7 @@ class GitHubClient:
         owner = owner or self.username
         url = f"{self.base_url}/repos/{owner}/{repo}/issues"
         payload = {"title": title, "body": body}
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self.session.post(url, json=payload, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
@@ -80,12 +419,12 @@ class GitHubClient:
         """
         owner = owner or self.username
         branch_url = f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{branch}"
-        branch_response = requests.get(branch_url, headers=self.headers)
+        branch_response = self.session.get(branch_url, timeout=self.timeout)
 
         if branch_response.status_code == 404:
             # Step 2: Get the SHA of the base branch
             base_ref_url = f"{self.base_url}/repos/{owner}/{repo}/git/ref/heads/{base_branch}"
-            base_response = requests.get(base_ref_url, headers=self.headers)
+            base_response = self.session.get(base_ref_url, timeout=self.timeout)
             base_response.raise_for_status()
             base_sha = base_response.json()["object"]["sha"]
 
@@ -95,16 +434,16 @@ class GitHubClient:
                 "sha": base_sha
             }
 
-            create_response = requests.post(
+            create_response = self.session.post(
                 f"{self.base_url}/repos/{owner}/{repo}/git/refs",
-                headers=self.headers,
-                json=create_branch_payload
+                json=create_branch_payload,
+                timeout=self.timeout
             )
             create_response.raise_for_status()
 
         # Check if file exists
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-        get_response = requests.get(url, headers=self.headers, params={"ref": branch})
+        get_response = self.session.get(url, params={"ref": branch}, timeout=self.timeout)
         file_exists = get_response.status_code == 200
         sha = get_response.json().get('sha') if file_exists else None
 
@@ -119,10 +458,83 @@ class GitHubClient:
         if sha:
             payload["sha"] = sha
 
-        response = requests.put(url, headers=self.headers, json=payload)
+        response = self.session.put(url, json=payload, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
+    def commit_files(self, owner, repo, files, message, branch="main", base_branch="main", max_workers=8):
+        """
+        Commit many files to a branch in a single commit through the Git Data API.
+
+        :param files: Mapping of repository path to new content; None deletes the path
+        :return: The new commit's sha, url and the paths it changed
+
+        Blobs are created in parallel, then one tree, one commit and one ref update
+        (or ref creation, when branch does not exist yet) make the change visible at
+        once: six or seven sequential calls plus the parallel blob uploads, however many
+        files change. Paths that already exist keep their file mode; new ones are
+        regular files.
+        """
+        owner = owner or self.username
+        repo_url = f"{self.base_url}/repos/{owner}/{repo}"
+
+        branch_response = self.session.get(f"{repo_url}/git/ref/heads/{branch}", timeout=self.timeout)
+        branch_exists = branch_response.status_code != 404
+        if branch_exists:
+            branch_response.raise_for_status()
+            parent_sha = branch_response.json()["object"]["sha"]
+        else:
+            base_response = self.session.get(f"{repo_url}/git/ref/heads/{base_branch}", timeout=self.timeout)
+            base_response.raise_for_status()
+            parent_sha = base_response.json()["object"]["sha"]
+
+        parent_response = self.session.get(f"{repo_url}/git/commits/{parent_sha}", timeout=self.timeout)
+        parent_response.raise_for_status()
+        base_tree_sha = parent_response.json()["tree"]["sha"]
+
+        def create_blob(content):
+            response = self.session.post(
+                f"{repo_url}/git/blobs",
+                json={"content": base64.b64encode(content.encode()).decode(), "encoding": "base64"},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()["sha"]
+
+        changed = [path for path, content in files.items() if content is not None]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            blob_shas = dict(zip(changed, executor.map(create_blob, [files[path] for path in changed])))
+
+        # Keep the executable bit and symlinks of paths that already exist
+        modes = self.get_tree_modes(owner, repo, base_tree_sha, files)
+        tree = [
+            {"path": path, "mode": modes.get(path, "100644"), "type": "blob", "sha": blob_shas.get(path)}
+            for path in files
+        ]
+        tree_response = self.session.post(f"{repo_url}/git/trees", json={"base_tree": base_tree_sha, "tree": tree}, timeout=self.timeout)
+        tree_response.raise_for_status()
+
+        commit_response = self.session.post(
+            f"{repo_url}/git/commits",
+            json={"message": message, "tree": tree_response.json()["sha"], "parents": [parent_sha]},
+            timeout=self.timeout
+        )
+        commit_response.raise_for_status()
+        commit = commit_response.json()
+
+        if branch_exists:
+            ref_response = self.session.patch(f"{repo_url}/git/refs/heads/{branch}", json={"sha": commit["sha"]}, timeout=self.timeout)
+        else:
+            ref_response = self.session.post(f"{repo_url}/git/refs", json={"ref": f"refs/heads/{branch}", "sha": commit["sha"]}, timeout=self.timeout)
+        ref_response.raise_for_status()
+
+        return {
+            "sha": commit["sha"],
+            "html_url": commit.get("html_url"),
+            "branch": branch,
+            "files": list(files),
+        }
+
     def create_pull_request(self, owner, repo, head_branch, base_branch, title, body=None):
         """
         Create a pull request from head_branch to base_branch.
@@ -135,6 +547,106 @@ class GitHubClient:
             "base": base_branch,
             "body": body or ""
         }
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self.session.post(url, json=payload, timeout=self.timeout)
         response.raise_for_status()
         return response.json()
+
+
+def _link_page(links, relation):
+    """
+    Page number of a Link header relation, e.g. rel="last" -> 7.
+    """
+    link = links.get(relation)
+    if not link:
+        return None
+    page = parse_qs(urlparse(link["url"]).query).get("page")
+    return int(page[0]) if page else None
+
+
+def _not_found(url):
+    """
+    The HTTPError a 404 from url raises, for paths missing from the mirror, so callers
+    handle both the same way.
+    """
+    response = Response()
+    response.status_code = 404
+    response.reason = "Not Found"
+    response.url = url
+    return HTTPError(f"404 Client Error: Not Found for url: {url}", response=response)
+
+
+def _read_bounded(chunks, max_chars):
+    """
+    (content, whether it is a snippet of a bigger file) of a file streamed as chunks:
+    the whole file if it fits in max_chars, otherwise _snippet of it, built from the
+    bytes already received and only as much of the rest as it needs.
+    """
+    received, size = [], 0
+    try:
+        for chunk in chunks:
+            received.append(chunk)
+            size += len(chunk)
+            # UTF-8 takes at least a byte per character
+            if size > max_chars * 4:
+                break
+        else:
+            content = b"".join(received).decode(errors="replace")
+            if len(content) <= max_chars:
+                return content, False
+        return _snippet(_iter_lines(itertools.chain(received, chunks)), max_chars), True
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _snippet(lines, max_chars, start_line=1, max_line_length=500):
+    """
+    Numbered lines from start_line until max_chars, with a closing note naming the next
+    line when there are more. Closes lines once done.
+    """
+    start_line = max(1, start_line)
+    snippet, size = [], 0
+    try:
+        for number, line in enumerate(lines, 1):
+            if number < start_line:
+                continue
+            line = f"{number}: {_clip(line, max_line_length)}"
+            if snippet and size + len(line) > max_chars:
+                snippet.append(f"... truncated; the file continues at line {number}, read it with start_line and end_line")
+                break
+            snippet.append(line)
+            size += len(line) + 1
+    finally:
+        lines.close()
+    return "\n".join(snippet)
+
+
+def _decode(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    return "".join(decoder.decode(chunk) for chunk in chunks) + decoder.decode(b"", final=True)
+
+
+def _iter_lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    # Pieces of the line still being received, joined once its end arrives
+    pending = []
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if "\n" not in text:
+            pending.append(text)
+            continue
+        pending.append(text)
+        lines = "".join(pending).split("\n")
+        pending = [lines.pop()]
+        for line in lines:
+            yield line.rstrip("\r")
+    tail = "".join(pending) + decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+def _clip(line, max_length):
+    if max_length is None or len(line) <= max_length:
+        return line
+    return f"{line[:max_length]} ... [{len(line) - max_length} more characters]"
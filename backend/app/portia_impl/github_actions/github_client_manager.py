@@ -1,11 +1,50 @@
 from .github_client import GitHubClient
+from .http_cache import ConditionalCache
+from .path_index import PathIndexCache
+from .repo_mirror import RepoMirror
+from .symbol_index import SymbolIndexCache
 
 class GitHubClientManager:
     _client: GitHubClient = None
+    # Outlives re-initialisation so every plan run revalidates instead of refetching
+    _cache: ConditionalCache = None
+    _path_indexes: PathIndexCache = None
+    _mirror: RepoMirror = None
+    _symbol_indexes: SymbolIndexCache = None
 
     @classmethod
     def initialize(cls, token: str, username: str):
-        cls._client = GitHubClient(token=token, username=username)
+        cls.install(cls.create_client(token, username))
+
+    @classmethod
+    def create_client(cls, token: str, username: str) -> GitHubClient:
+        """
+        A client sharing the process-wide caches, without making it the current one.
+        """
+        if cls._cache is None:
+            cls._cache = ConditionalCache()
+            cls._path_indexes = PathIndexCache()
+            mirror = RepoMirror()
+            # Only with GITHUB_MIRROR_PATH set; otherwise every file is read through the API
+            cls._mirror = mirror if mirror.root else None
+            cls._symbol_indexes = SymbolIndexCache()
+        return GitHubClient(
+            token=token,
+            username=username,
+            cache=cls._cache,
+            path_indexes=cls._path_indexes,
+            mirror=cls._mirror,
+            symbol_indexes=cls._symbol_indexes,
+        )
+
+    @classmethod
+    def install(cls, client: GitHubClient) -> None:
+        """
+        Make client the current one, closing the connection pool of the one it replaces.
+        """
+        previous, cls._client = cls._client, client
+        if previous is not None and previous is not client:
+            previous.session.close()
 
     @classmethod
     def get_client(cls) -> GitHubClient:
@@ -1,7 +1,13 @@
 from pydantic import BaseModel, Field
 from portia import Tool, ToolRunContext, MultipleChoiceClarification
 from .github_client_manager import GitHubClientManager
-from typing import Any, List, Literal
+from ..stack_trace import culprit_frames
+from typing import Any, Dict, List, Literal, Optional
+
+# Bounds on file content handed back to the planner, so one big or minified file
+# cannot crowd everything else out of the prompt
+MAX_FILE_CHARS = 20000
+MAX_LINE_LENGTH = 500
 
 class ListReposSchema(BaseModel):
     user: str = Field(..., description="GitHub username whose repositories should be listed")
@@ -10,16 +16,33 @@ class ListReposSchema(BaseModel):
 class ListFilesSchema(BaseModel):
     repo: str = Field(..., description="Repository name")
     path: str = Field("", description="Path within the repository to list files from")
+    recursive: bool = Field(False, description="List every file below the path, as full repository paths, instead of one level")
 
 
 class ReadFileSchema(BaseModel):
     repo: str = Field(..., description="Repository name")
     path: str = Field(..., description="Path of the file to read")
+    start_line: Optional[int] = Field(None, description="First line to read (1-based). Leave empty to read the whole file")
+    end_line: Optional[int] = Field(None, description="Last line to read (inclusive). Leave empty to read the whole file")
+    max_chars: int = Field(MAX_FILE_CHARS, description="Longest content to return. Bigger files come back as their first numbered lines up to this size, ending with the line to continue from")
+
+
+class LocateErrorSourceSchema(BaseModel):
+    repo: str = Field(..., description="Repository name")
+    error_logs: List[str] = Field(..., description="The error logs containing stack traces")
+    context_lines: int = Field(20, description="Number of lines to include before and after the failing line")
+
+
+class FindCodeSchema(BaseModel):
+    repo: str = Field(..., description="Repository name")
+    query: str = Field(..., description="A log message, error message, or function / class name to find in the code")
+    limit: int = Field(10, description="Maximum number of matches to return")
 
 
 class FileWithMetadataSchema(BaseModel):
     repo: str = Field(..., description="Repository name")
     path: str = Field(..., description="Path of the file to retrieve with metadata")
+    max_chars: int = Field(MAX_FILE_CHARS, description="Longest content to return; \"truncated\" is true when the file was cut short")
 
 
 class CreateIssueSchema(BaseModel):
@@ -37,6 +60,14 @@ class AddCommitFileSchema(BaseModel):
     base_branch: str = Field("main", description="Branch to commit to")
 
 
+class CommitFilesSchema(BaseModel):
+    repo: str = Field(..., description="Repository name")
+    files: Dict[str, str] = Field(..., description="Mapping of file path in the repo to its full new content")
+    message: str = Field(..., description="Commit message")
+    branch: str = Field("main", description="Branch to commit to")
+    base_branch: str = Field("main", description="Branch to create the branch from if it does not exist yet")
+
+
 class PullRequestSchema(BaseModel):
     repo: str = Field(..., description="Repository name")
     head_branch: str = Field(..., description="Source branch (the one with changes)")
@@ -129,14 +160,14 @@ class ListGitHubRepos(Tool):
 class ListGitHubRepoFiles(Tool):
     id: str = "list_github_repo_files"
     name: str = "list_github_repo_files"  
-    description: str = "List all files in a GitHub repository at a given path."  
+    description: str = "List all files in a GitHub repository at a given path, optionally including all nested files."  
     args_schema: type[BaseModel] = ListFilesSchema
     output_schema: tuple[str, str] = ("List", "List of files in a repository at a given path")
 
-    def run(self, _:ToolRunContext, repo: str, path: str = "") -> Any:
+    def run(self, _:ToolRunContext, repo: str, path: str = "", recursive: bool = False) -> Any:
         client = GitHubClientManager.get_client()
 
-        return client.list_files(client.username, repo, path)
+        return client.list_files(client.username, repo, path, recursive)
 
 
 # 3. Read File Content
@@ -147,10 +178,13 @@ class ReadGitHubFile(Tool):
     args_schema: type[BaseModel] = ReadFileSchema
     output_schema: tuple[str, str] = ("str", "Read a file's content from a repository")
 
-    def run(self, _:ToolRunContext, repo: str, path: str) -> Any:
+    def run(self, _:ToolRunContext, repo: str, path: str, start_line: Optional[int] = None, end_line: Optional[int] = None, max_chars: int = MAX_FILE_CHARS) -> Any:
         client = GitHubClientManager.get_client()
 
-        return client.read_file(client.username, repo, path)
+        if start_line is not None or end_line is not None:
+            start_line = start_line or 1
+            return client.read_file_lines(client.username, repo, path, start_line, end_line or start_line + 50, MAX_LINE_LENGTH)
+        return client.read_file_bounded(client.username, repo, path, max_chars)
 
 
 # 4. File with Metadata
@@ -161,10 +195,10 @@ class GetGitHubFileWithMetadata(Tool):
     args_schema: type[BaseModel] = FileWithMetadataSchema
     output_schema: tuple[str, str] = ("dict", "Get file metadata and content as a dict")
 
-    def run(self, _:ToolRunContext, repo: str, path: str) -> Any:
+    def run(self, _:ToolRunContext, repo: str, path: str, max_chars: int = MAX_FILE_CHARS) -> Any:
         client = GitHubClientManager.get_client()
 
-        return client.get_file_metadata_and_content(client.username, repo, path)
+        return client.get_file_metadata_and_content(client.username, repo, path, max_chars)
 
 
 # 5. Create Issue (auth)
@@ -178,7 +212,6 @@ class CreateGitHubIssue(Tool):
     def run(self, _:ToolRunContext, repo: str, title: str, body: str) -> Any:
         client = GitHubClientManager.get_client()
 
-        token = client.token
         # return client.create_issue(token, owner, repo, title, body)
         return client.create_issue(client.username, repo, title, body)
 
@@ -194,11 +227,24 @@ class GitHubAddCommitFile(Tool):
     def run(self, _:ToolRunContext, repo: str, path: str, content: str, message: str, branch: str = "main", base_branch: str = "main") -> Any:
         client = GitHubClientManager.get_client()
 
-        token = client.token
         return client.add_and_commit_file(client.username, repo, path, content, message, branch, base_branch)
 
 
-# 7. Create Pull Request (auth)
+# 7. Commit Multiple Files (auth)
+class GitHubCommitFiles(Tool):
+    id: str = "github_commit_files"
+    name: str = "github_commit_files"
+    description: str = "Add or update several files in a GitHub repo and commit them together as a single commit."
+    args_schema: type[BaseModel] = CommitFilesSchema
+    output_schema: tuple[str, str] = ("dict", "The new commit's sha, url, branch and the files it changed")
+
+    def run(self, _:ToolRunContext, repo: str, files: Dict[str, str], message: str, branch: str = "main", base_branch: str = "main") -> Any:
+        client = GitHubClientManager.get_client()
+
+        return client.commit_files(client.username, repo, files, message, branch, base_branch)
+
+
+# 8. Create Pull Request (auth)
 class CreateGitHubPullRequest(Tool):
     id: str = "create_github_pull_request"
     name: str = "create_github_pull_request"  
@@ -209,5 +255,62 @@ class CreateGitHubPullRequest(Tool):
     def run(self, _:ToolRunContext, repo: str, head_branch: str, base_branch: str, title: str, body: str = "") -> Any:
         client = GitHubClientManager.get_client()
 
-        token = client.token
-        return client.create_pull_request(client.username, repo, head_branch, base_branch, title, body)
\ No newline at end of file
+        return client.create_pull_request(client.username, repo, head_branch, base_branch, title, body)
+
+
+# 9. Locate Error Source from stack traces
+class LocateErrorSource(Tool):
+    id: str = "locate_error_source"
+    name: str = "locate_error_source"
+    description: str = (
+        "Find the repository file, line and function an error was raised from by parsing the "
+        "Python, Node or Java stack traces in the error logs. Returns the file path, the line "
+        "range around the failure and that code snippet."
+    )
+    args_schema: type[BaseModel] = LocateErrorSourceSchema
+    output_schema: tuple[str, str] = ("dict", "The culprit file path, line, function, line range and code snippet, or the parsed frames if none could be mapped to the repo")
+
+    def run(self, _:ToolRunContext, repo: str, error_logs: List[str], context_lines: int = 20) -> Any:
+        client = GitHubClientManager.get_client()
+
+        frames = culprit_frames(error_logs)
+        # One tree listing for the whole lookup, reused while the repo's head is unchanged
+        index = client.get_path_index(client.username, repo) if frames else None
+        for frame in frames:
+            path = index.resolve(frame.path)
+            if path is None:
+                continue
+            start_line = max(1, frame.line - context_lines)
+            end_line = frame.line + context_lines
+            return {
+                "path": path,
+                "line": frame.line,
+                "function": frame.function,
+                "start_line": start_line,
+                "end_line": end_line,
+                "snippet": client.read_file_lines(client.username, repo, path, start_line, end_line, MAX_LINE_LENGTH),
+            }
+
+        return {
+            "path": None,
+            "frames": [f"{frame.path}:{frame.line} in {frame.function}" for frame in frames],
+        }
+
+
+# 10. Find Code for a log message or symbol
+class FindCodeForLogMessage(Tool):
+    id: str = "find_code_for_log_message"
+    name: str = "find_code_for_log_message"
+    description: str = (
+        "Find the file and line that emitted a log or error message, or where a function or "
+        "class is defined, using an index of the repository's identifiers and string literals. "
+        "Use it when the error logs have no stack trace pointing into the repo."
+    )
+    args_schema: type[BaseModel] = FindCodeSchema
+    output_schema: tuple[str, str] = ("List", "Matches with path, line, kind (literal, definition, reference), matched text and score, best first")
+
+    def run(self, _:ToolRunContext, repo: str, query: str, limit: int = 10) -> Any:
+        client = GitHubClientManager.get_client()
+
+        index = client.get_symbol_index(client.username, repo)
+        return [match._asdict() for match in index.lookup(query, limit)]
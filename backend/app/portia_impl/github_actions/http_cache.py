@@ -0,0 +1,119 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+
+class ConditionalCache:
+    """
+    LRU cache of GitHub API responses together with their validators.
+
+    Entries keep the ETag and Last-Modified headers of the response they came from so
+    the next read of the same resource can be sent as a conditional request; GitHub
+    answers an unchanged resource with 304, which does not count against the rate
+    limit. The least recently used entries are evicted beyond max_entries.
+
+    Entries live in memory unless a path is given (or GITHUB_CACHE_PATH is set), in
+    which case they are written to a JSON file at most every autosave_interval seconds
+    and on save().
+    """
+
+    def __init__(self, max_entries: int = 1000, path: Optional[str] = None, autosave_interval: float = 5.0):
+        self.max_entries = max_entries
+        self.path = os.getenv("GITHUB_CACHE_PATH", "") if path is None else path
+        self.autosave_interval = autosave_interval
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, dict]" = self._load()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self) -> "OrderedDict[str, dict]":
+        if not self.path or not os.path.exists(self.path):
+            return OrderedDict()
+        try:
+            with open(self.path) as f:
+                return OrderedDict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return OrderedDict()
+
+    def _flush(self) -> None:
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(tmp_path, self.path)
+
+    def validators(self, key: str) -> dict:
+        """
+        Conditional request headers for a cached resource, empty if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, key: str) -> dict:
+        """
+        Record a 304 for key and return the cached entry (body, links and validators).
+        """
+        with self._lock:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def store(self, key: str, body, etag: Optional[str], last_modified: Optional[str], links: Optional[dict] = None) -> None:
+        """
+        Record a full response for key. Responses without validators are not kept.
+        """
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                return
+            self._entries[key] = {"etag": etag, "last_modified": last_modified, "body": body, "links": links or {}}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+            if time.monotonic() - self._last_flush >= self.autosave_interval:
+                self._flush()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def save(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+            self._flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
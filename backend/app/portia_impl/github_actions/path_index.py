@@ -0,0 +1,96 @@
+import posixpath
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+from ..stack_trace import resolve_repo_path
+
+
+class RepoPathIndex:
+    """
+    Every file path of a repository at one commit, indexed for constant-time lookups
+    by basename, extension and directory.
+
+    Built from a single recursive Git Trees API listing. A commit's tree never
+    changes, so an index is valid for as long as its sha is the one being looked at.
+    """
+
+    def __init__(self, paths: Iterable[str], sha: Optional[str] = None):
+        self.sha = sha
+        self.paths = frozenset(paths)
+        self._by_basename: Dict[str, List[str]] = defaultdict(list)
+        self._by_extension: Dict[str, List[str]] = defaultdict(list)
+        # Directory -> every file below it, at any depth
+        self._by_directory: Dict[str, List[str]] = defaultdict(list)
+        for path in sorted(self.paths):
+            directory, basename = posixpath.split(path)
+            self._by_basename[basename].append(path)
+            self._by_extension[posixpath.splitext(basename)[1].lower()].append(path)
+            while directory:
+                self._by_directory[directory].append(path)
+                directory = posixpath.dirname(directory)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.paths
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def find_by_basename(self, basename: str) -> List[str]:
+        return list(self._by_basename.get(basename, ()))
+
+    def find_by_extension(self, extension: str) -> List[str]:
+        """
+        Paths with the given extension, e.g. ".py" (case-insensitive).
+        """
+        extension = extension.lower()
+        if extension and not extension.startswith("."):
+            extension = "." + extension
+        return list(self._by_extension.get(extension, ()))
+
+    def list_directory(self, directory: str = "", recursive: bool = True) -> List[str]:
+        """
+        Files below directory ("" for the repository root). Without recursive only its
+        direct children are returned, subdirectories with a trailing "/".
+        """
+        directory = directory.strip("/")
+        paths = self._by_directory.get(directory, ()) if directory else sorted(self.paths)
+        if recursive:
+            return list(paths)
+        prefix_length = len(directory) + 1 if directory else 0
+        children = OrderedDict()
+        for path in paths:
+            name, _, rest = path[prefix_length:].partition("/")
+            children[name + "/" if rest else name] = None
+        return list(children)
+
+    def resolve(self, frame_path: str) -> Optional[str]:
+        """
+        Map a runtime path from a stack trace to the repository path it was deployed from.
+        """
+        return resolve_repo_path(frame_path, self.paths, self._by_basename)
+
+
+class PathIndexCache:
+    """
+    Thread-safe LRU of RepoPathIndex objects keyed by (owner, repo, sha).
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._indexes: "OrderedDict[tuple, RepoPathIndex]" = OrderedDict()
+
+    def get(self, owner: str, repo: str, sha: str) -> Optional[RepoPathIndex]:
+        with self._lock:
+            index = self._indexes.get((owner, repo, sha))
+            if index is not None:
+                self._indexes.move_to_end((owner, repo, sha))
+            return index
+
+    def put(self, owner: str, repo: str, index: RepoPathIndex) -> None:
+        with self._lock:
+            self._indexes[(owner, repo, index.sha)] = index
+            self._indexes.move_to_end((owner, repo, index.sha))
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
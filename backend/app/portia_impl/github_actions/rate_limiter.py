@@ -0,0 +1,212 @@
+import hashlib
+import heapq
+import itertools
+import time
+from threading import Condition
+from typing import Dict, Optional
+
+import requests
+
+# Lower runs first: writes finish a plan run, speculative reads only help it along
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_SPECULATIVE = 2
+
+# GitHub asks for at least a minute's wait on a secondary rate limit without Retry-After
+SECONDARY_RATE_LIMIT_WAIT = 60.0
+
+
+class _TokenBudget:
+    __slots__ = ("limit", "remaining", "reset_at", "paused_until", "tokens", "refilled_at", "in_flight", "waiters", "requests", "throttled")
+
+    def __init__(self, burst: int):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.tokens = float(burst)
+        self.refilled_at = time.time()
+        self.in_flight = 0
+        self.waiters: list = []
+        self.requests = 0
+        self.throttled = 0
+
+
+class GitHubRequestScheduler:
+    """
+    Process-wide gate in front of every GitHub API request.
+
+    Each token's budget is tracked from the X-RateLimit-* headers of its responses. A
+    request waits, rather than fails, while:
+
+    - the token is paused after a 403/429 rate limit (Retry-After, the reset time, or
+      a minute for secondary limits without either),
+    - max_concurrency requests of the token are already in flight,
+    - the budget left is only the reserve kept for writes and this is not a write,
+    - the budget is below pace_below of the limit and the token bucket is empty. The
+      bucket then refills at remaining / seconds-to-reset, spreading what is left
+      evenly instead of spending it all and stalling until the reset,
+    - a higher priority request of the same token is waiting.
+    """
+
+    def __init__(self, max_concurrency: int = 4, reserve: int = 50, pace_below: float = 0.2, burst: int = 10):
+        self.max_concurrency = max_concurrency
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.burst = burst
+        self._condition = Condition()
+        self._budgets: Dict[str, _TokenBudget] = {}
+        self._sequence = itertools.count()
+
+    @staticmethod
+    def token_key(authorization: str) -> str:
+        return hashlib.sha1(authorization.encode()).hexdigest()[:12]
+
+    def _budget(self, key: str) -> _TokenBudget:
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = self._budgets[key] = _TokenBudget(self.burst)
+        return budget
+
+    def _refill(self, budget: _TokenBudget, now: float) -> float:
+        """
+        Add the tokens earned since the last refill and return the refill rate per
+        second, or 0 when the budget is healthy and requests are not paced.
+        """
+        if budget.remaining is None or budget.limit is None or budget.remaining >= budget.limit * self.pace_below:
+            budget.tokens = float(self.burst)
+            budget.refilled_at = now
+            return 0.0
+        rate = budget.remaining / max(1.0, budget.reset_at - now)
+        budget.tokens = min(float(self.burst), budget.tokens + (now - budget.refilled_at) * rate)
+        budget.refilled_at = now
+        return rate
+
+    def _wait_time(self, budget: _TokenBudget, priority: int, ticket: tuple) -> Optional[float]:
+        """
+        None if the request may go now, otherwise how long to wait before checking again.
+        """
+        now = time.time()
+        if now < budget.paused_until:
+            return budget.paused_until - now
+        if budget.waiters[0] != ticket or budget.in_flight >= self.max_concurrency:
+            # Woken up by release() or by the request ahead starting
+            return 1.0
+        if budget.remaining is not None and now < budget.reset_at:
+            available = budget.remaining - budget.in_flight
+            if available <= 0 or (priority > PRIORITY_WRITE and available <= self.reserve):
+                return budget.reset_at - now
+        rate = self._refill(budget, now)
+        if rate and budget.tokens < 1:
+            return (1 - budget.tokens) / rate
+        return None
+
+    def acquire(self, key: str, priority: int = PRIORITY_READ) -> None:
+        with self._condition:
+            budget = self._budget(key)
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(budget.waiters, ticket)
+            waited = False
+            while True:
+                wait = self._wait_time(budget, priority, ticket)
+                if wait is None:
+                    break
+                waited = True
+                self._condition.wait(min(wait, 5.0))
+            heapq.heappop(budget.waiters)
+            budget.in_flight += 1
+            budget.tokens -= 1
+            budget.requests += 1
+            budget.throttled += waited
+            self._condition.notify_all()
+
+    def release(self, key: str, response: Optional[requests.Response]) -> bool:
+        """
+        Record the outcome of a request. Returns True if it was rejected by a rate limit
+        and should be sent again.
+        """
+        with self._condition:
+            budget = self._budget(key)
+            budget.in_flight -= 1
+            rate_limited = response is not None and self._update(budget, response)
+            self._condition.notify_all()
+            return rate_limited
+
+    def _update(self, budget: _TokenBudget, response: requests.Response) -> bool:
+        headers = response.headers
+        now = time.time()
+        if headers.get("X-RateLimit-Limit"):
+            budget.limit = int(headers["X-RateLimit-Limit"])
+        if headers.get("X-RateLimit-Remaining"):
+            budget.remaining = int(headers["X-RateLimit-Remaining"])
+        if headers.get("X-RateLimit-Reset"):
+            budget.reset_at = float(headers["X-RateLimit-Reset"])
+        if budget.reset_at and now >= budget.reset_at:
+            # The window rolled over since the last response we saw
+            budget.remaining = None
+
+        if response.status_code not in (403, 429):
+            return False
+        if headers.get("Retry-After"):
+            budget.paused_until = max(budget.paused_until, now + float(headers["Retry-After"]))
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            budget.paused_until = max(budget.paused_until, budget.reset_at)
+        elif "rate limit" in response.text.lower():
+            budget.paused_until = max(budget.paused_until, now + SECONDARY_RATE_LIMIT_WAIT)
+        else:
+            # A plain permission error
+            return False
+        return True
+
+    def budget(self) -> Dict[str, dict]:
+        """
+        Current budget per token (keyed by a hash of the token), for monitoring.
+        """
+        now = time.time()
+        with self._condition:
+            return {
+                key: {
+                    "limit": budget.limit,
+                    "remaining": budget.remaining,
+                    "reset_in": round(max(0.0, budget.reset_at - now), 1) if budget.reset_at else None,
+                    "paused_for": round(max(0.0, budget.paused_until - now), 1),
+                    "in_flight": budget.in_flight,
+                    "queued": len(budget.waiters),
+                    "requests": budget.requests,
+                    "throttled": budget.throttled,
+                }
+                for key, budget in self._budgets.items()
+            }
+
+
+DEFAULT_SCHEDULER = GitHubRequestScheduler()
+
+
+class RateLimitedSession(requests.Session):
+    """
+    Session whose requests all pass through a GitHubRequestScheduler.
+
+    Requests take an optional priority (PRIORITY_*); by default GET and HEAD are reads
+    and everything else is a write. A request rejected by a rate limit is queued again
+    until the limit lifts, up to max_rate_limit_retries times.
+    """
+
+    def __init__(self, scheduler: Optional[GitHubRequestScheduler] = None, max_rate_limit_retries: int = 3):
+        super().__init__()
+        self.scheduler = scheduler or DEFAULT_SCHEDULER
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+    def request(self, method, url, *args, priority: Optional[int] = None, **kwargs):
+        if priority is None:
+            priority = PRIORITY_READ if method.upper() in ("GET", "HEAD") else PRIORITY_WRITE
+        key = self.scheduler.token_key(self.headers.get("Authorization", ""))
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.scheduler.acquire(key, priority)
+            response = None
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            finally:
+                rate_limited = self.scheduler.release(key, response)
+            if not rate_limited or attempt == self.max_rate_limit_retries:
+                return response
+        return response
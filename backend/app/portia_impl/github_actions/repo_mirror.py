@@ -0,0 +1,205 @@
+import json
+import mmap
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# Written last into a snapshot directory; a snapshot without it is incomplete
+COMPLETE_MARKER = ".mirror_complete"
+
+
+class RepoMirror:
+    """
+    Local copies of repositories, one directory per commit: <root>/<owner>/<repo>/<sha>.
+
+    A snapshot is downloaded once as a tarball and extracted, after which files are
+    listed and read from disk (memory-mapped) without any API call and without the
+    contents API's 1 MB limit. The branch head is looked up again at most every
+    ref_ttl seconds and a new snapshot is only fetched when it moved. Snapshots are
+    evicted least recently used first once they take more than max_bytes together.
+
+    Off unless a root is given or GITHUB_MIRROR_PATH is set, since the first read of a
+    repository downloads all of it.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = 2 * 1024 ** 3, ref_ttl: float = 60.0):
+        self.root = os.getenv("GITHUB_MIRROR_PATH", "") if root is None else root
+        self.max_bytes = max_bytes
+        self.ref_ttl = ref_ttl
+        self._lock = Lock()
+        self._snapshot_locks: Dict[tuple, Lock] = {}
+        self._refs: Dict[tuple, Tuple[str, float]] = {}
+
+    def snapshot_path(self, owner: str, repo: str, sha: str) -> str:
+        return os.path.join(self.root, owner, repo, sha)
+
+    def resolve(self, client, owner: str, repo: str, ref: str = "HEAD") -> str:
+        """
+        Commit sha of ref, reusing the last answer for ref_ttl seconds.
+        """
+        key = (owner, repo, ref)
+        with self._lock:
+            cached = self._refs.get(key)
+        if cached and time.monotonic() - cached[1] < self.ref_ttl:
+            return cached[0]
+        sha = client.get_commit_sha(owner, repo, ref)
+        with self._lock:
+            self._refs[key] = (sha, time.monotonic())
+        return sha
+
+    def ensure(self, client, owner: str, repo: str, ref: str = "HEAD") -> str:
+        """
+        Path of the local snapshot of repo at ref, downloading it if needed.
+        """
+        sha = self.resolve(client, owner, repo, ref)
+        path = self.snapshot_path(owner, repo, sha)
+        marker = os.path.join(path, COMPLETE_MARKER)
+        if os.path.exists(marker):
+            os.utime(marker)
+            return path
+
+        key = (owner, repo, sha)
+        with self._lock:
+            snapshot_lock = self._snapshot_locks.setdefault(key, Lock())
+        with snapshot_lock:
+            try:
+                if not os.path.exists(marker):
+                    self._download(client, owner, repo, sha, path)
+                    self.evict(keep=path)
+            finally:
+                # Threads still waiting hold the lock themselves and find the marker
+                with self._lock:
+                    if self._snapshot_locks.get(key) is snapshot_lock:
+                        del self._snapshot_locks[key]
+        return path
+
+    def _download(self, client, owner: str, repo: str, sha: str, path: str) -> None:
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{sha}.", dir=parent)
+        try:
+            with tempfile.TemporaryFile() as archive:
+                client.download_tarball(owner, repo, sha, archive)
+                archive.seek(0)
+                size = _extract(archive, staging)
+            with open(os.path.join(staging, COMPLETE_MARKER), "w") as f:
+                json.dump({"sha": sha, "bytes": size}, f)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _snapshots(self) -> List[Tuple[float, int, str]]:
+        """
+        (last used, bytes, path) of every complete snapshot.
+        """
+        snapshots = []
+        if not os.path.isdir(self.root):
+            return snapshots
+        for owner in os.scandir(self.root):
+            if not owner.is_dir():
+                continue
+            for repo in os.scandir(owner.path):
+                if not repo.is_dir():
+                    continue
+                for snapshot in os.scandir(repo.path):
+                    marker = os.path.join(snapshot.path, COMPLETE_MARKER)
+                    try:
+                        with open(marker) as f:
+                            size = json.load(f)["bytes"]
+                        snapshots.append((os.path.getmtime(marker), size, snapshot.path))
+                    except (OSError, ValueError, KeyError):
+                        continue
+        return snapshots
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._snapshots())
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Remove least recently used snapshots until the mirror fits in max_bytes.
+        """
+        snapshots = sorted(self._snapshots())
+        total = sum(size for _, size, _ in snapshots)
+        evicted = []
+        for _, size, path in snapshots:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted.append(path)
+        return evicted
+
+    def _local_path(self, snapshot: str, path: str) -> str:
+        local_path = os.path.realpath(os.path.join(snapshot, path.strip("/")))
+        if local_path != os.path.realpath(snapshot) and not local_path.startswith(os.path.realpath(snapshot) + os.sep):
+            raise FileNotFoundError(path)
+        return local_path
+
+    def list_files(self, client, owner: str, repo: str, path: str = "", recursive: bool = False, ref: str = "HEAD") -> List[str]:
+        """
+        Names at path, like the contents API, or with recursive=True the repository
+        paths of every file below it.
+        """
+        snapshot = self.ensure(client, owner, repo, ref)
+        directory = self._local_path(snapshot, path)
+        if not recursive:
+            return sorted(name for name in os.listdir(directory) if name != COMPLETE_MARKER)
+        paths = []
+        for current, _, files in os.walk(directory):
+            relative = os.path.relpath(current, snapshot)
+            for name in files:
+                if name != COMPLETE_MARKER:
+                    paths.append(name if relative == "." else f"{relative}/{name}".replace(os.sep, "/"))
+        return sorted(paths)
+
+    def open_file(self, client, owner: str, repo: str, path: str, ref: str = "HEAD"):
+        """
+        Binary file object of a file in the snapshot, for reading it in pieces.
+        """
+        return open(self._local_path(self.ensure(client, owner, repo, ref), path), "rb")
+
+    def read_bytes(self, client, owner: str, repo: str, path: str, ref: str = "HEAD") -> bytes:
+        local_path = self._local_path(self.ensure(client, owner, repo, ref), path)
+        with open(local_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def read_file(self, client, owner: str, repo: str, path: str, ref: str = "HEAD") -> str:
+        return self.read_bytes(client, owner, repo, path, ref).decode()
+
+
+def _extract(archive, destination: str) -> int:
+    """
+    Extract a GitHub tarball into destination, dropping its "<owner>-<repo>-<sha>/" top
+    directory. Only regular files and directories are extracted and nothing may land
+    outside destination. Returns the number of bytes written.
+    """
+    size = 0
+    with tarfile.open(fileobj=archive, mode="r:*") as tar:
+        for member in tar:
+            parts = member.name.split("/", 1)
+            if len(parts) < 2 or not parts[1]:
+                continue
+            relative = os.path.normpath(parts[1])
+            if relative.startswith("..") or os.path.isabs(relative):
+                continue
+            target = os.path.join(destination, relative)
+            if member.isdir():
+                os.makedirs(target, exist_ok=True)
+            elif member.isfile():
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with tar.extractfile(member) as source, open(target, "wb") as f:
+                    shutil.copyfileobj(source, f)
+                size += member.size
+    return size
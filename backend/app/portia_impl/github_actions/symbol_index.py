@@ -0,0 +1,289 @@
+import math
+import os
+import re
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+INDEXED_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".java", ".kt", ".scala", ".go",
+    ".rb", ".php", ".cs", ".rs", ".c", ".h", ".cc", ".cpp", ".hpp", ".swift", ".astro", ".vue",
+}
+
+# Bigger files are generated or vendored far more often than hand-written
+MAX_FILE_BYTES = 1024 * 1024
+
+# Identifiers used in more files than this are too common to point anywhere
+MAX_IDENTIFIER_POSTINGS = 50
+
+DEFINITION = re.compile(
+    r"(?m)^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+|abstract\s+|final\s+)*"
+    r"(?:async\s+)?(?:def|class|function\*?|func|fn|interface|struct|enum|trait|type|record)\s+(?P<name>[A-Za-z_$][\w$]*)"
+    r"|^\s*(?:export\s+)?(?:const|let|var)\s+(?P<arrow>[A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>|[\w$]+\s*=>)"
+    r"|^\s*(?:public|private|protected)\s+(?:static\s+)?(?:final\s+)?[\w<>\[\],.?]+\s+(?P<method>[A-Za-z_$][\w$]*)\s*\("
+)
+# Cheap first pass: only lines starting with one of these keywords can hold a definition
+DEFINITION_LINE = re.compile(
+    r"(?m)^[ \t]*(?=(?:export|default|public|private|protected|static|abstract|final|async|def|class|"
+    r"function|func|fn|interface|struct|enum|trait|type|record|const|let|var)\b)"
+)
+IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]{2,}")
+STRING_LITERAL = re.compile(r"""(?:"((?:[^"\\\n]|\\.){4,})"|'((?:[^'\\\n]|\\.){4,})'|`((?:[^`\\\n]|\\.){4,})`)""")
+# printf-style, str.format / f-string / template-literal placeholders
+PLACEHOLDER = re.compile(r"%[-+ #0]*\d*(?:\.\d+)?[sdifrxXeEgGoc]|\$?\{[^{}]*\}")
+WORD = re.compile(r"[A-Za-z][A-Za-z_]{2,}")
+
+STOP_WORDS = frozenset(
+    "and the for not with from import return self this that def class function const let var "
+    "true false none null undefined new public private protected static void int str string "
+    "else elif while try except catch finally raise throw async await yield lambda pass".split()
+)
+STOP_IDENTIFIERS = STOP_WORDS | {word.capitalize() for word in STOP_WORDS}
+
+
+class SymbolMatch(NamedTuple):
+    path: str
+    line: int
+    kind: str
+    text: str
+    score: float
+
+
+class _Literal(NamedTuple):
+    path: str
+    line: int
+    text: str
+    words: frozenset
+
+
+def _template_regex(text: str) -> "re.Pattern":
+    """
+    Regex matching the messages a string literal can produce, placeholders matching anything.
+    """
+    parts = PLACEHOLDER.split(text)
+    return re.compile(".*?".join(re.escape(part) for part in parts), re.DOTALL)
+
+
+class SymbolIndex:
+    """
+    Inverted index from identifiers, definitions and string literals (log message
+    templates) of a repository snapshot to the lines they appear on.
+
+    Files are tokenized with language-agnostic patterns, so Python, JS/TS, Java, Go and
+    similar sources are all covered without a parser. Uses of an identifier are kept
+    once per file, at its first line. update() re-indexes only the files that changed
+    between two commits.
+    """
+
+    def __init__(self, sha: Optional[str] = None):
+        self.sha = sha
+        self.definitions: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        self.identifiers: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        self.literals: Dict[int, _Literal] = {}
+        self.literal_words: Dict[str, set] = defaultdict(set)
+        self._by_path: Dict[str, Tuple[set, set, List[int]]] = {}
+        self._next_literal = 0
+        self.indexed_bytes = 0
+
+    @classmethod
+    def build(cls, root: str, sha: Optional[str] = None) -> "SymbolIndex":
+        """
+        Index every source file below a directory.
+        """
+        index = cls(sha)
+        for current, directories, files in os.walk(root):
+            directories[:] = [d for d in directories if not d.startswith(".") and d != "node_modules"]
+            for name in files:
+                local_path = os.path.join(current, name)
+                path = os.path.relpath(local_path, root).replace(os.sep, "/")
+                text = _read_source(local_path)
+                if text is not None:
+                    index.add_file(path, text)
+        return index
+
+    @staticmethod
+    def is_indexed(path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in INDEXED_EXTENSIONS
+
+    def add_file(self, path: str, text: str) -> None:
+        self.remove_file(path)
+        definitions, literal_ids = set(), []
+
+        # Definitions and literals are rare: find them in the whole text and count
+        # newlines up to each match instead of running the patterns line by line
+        line, position = 1, 0
+        for candidate in DEFINITION_LINE.finditer(text):
+            match = DEFINITION.match(text, candidate.start())
+            if match is None:
+                continue
+            line += text.count("\n", position, match.start())
+            position = match.start()
+            name = match["name"] or match["arrow"] or match["method"]
+            self.definitions[name].append((path, line))
+            definitions.add(name)
+
+        line, position = 1, 0
+        for match in STRING_LITERAL.finditer(text):
+            line += text.count("\n", position, match.start())
+            position = match.start()
+            literal = match[1] or match[2] or match[3]
+            words = frozenset(word.lower() for word in WORD.findall(PLACEHOLDER.sub(" ", literal)))
+            if not words - STOP_WORDS:
+                continue
+            literal_id = self._next_literal
+            self._next_literal += 1
+            self.literals[literal_id] = _Literal(path, line, literal, words)
+            for word in words:
+                self.literal_words[word].add(literal_id)
+            literal_ids.append(literal_id)
+
+        # First line each identifier is used on: walking the lines backwards, later
+        # (earlier-line) updates overwrite, and all of it stays in C
+        first_use: Dict[str, int] = {}
+        lines = text.splitlines()
+        for number in range(len(lines), 0, -1):
+            first_use.update(dict.fromkeys(IDENTIFIER.findall(lines[number - 1]), number))
+        identifiers = first_use.keys() - STOP_IDENTIFIERS
+        for identifier in identifiers:
+            postings = self.identifiers[identifier]
+            if len(postings) < MAX_IDENTIFIER_POSTINGS:
+                postings.append((path, first_use[identifier]))
+
+        self._by_path[path] = (definitions, identifiers, literal_ids)
+        self.indexed_bytes += len(text)
+
+    def remove_file(self, path: str) -> None:
+        entry = self._by_path.pop(path, None)
+        if entry is None:
+            return
+        definitions, identifiers, literal_ids = entry
+        for postings_by_name, names in ((self.definitions, definitions), (self.identifiers, identifiers)):
+            for name in names:
+                remaining = [posting for posting in postings_by_name[name] if posting[0] != path]
+                if remaining:
+                    postings_by_name[name] = remaining
+                else:
+                    del postings_by_name[name]
+        for literal_id in literal_ids:
+            literal = self.literals.pop(literal_id)
+            for word in literal.words:
+                self.literal_words[word].discard(literal_id)
+                if not self.literal_words[word]:
+                    del self.literal_words[word]
+
+    def update(self, root: str, changed_paths: Iterable[str], sha: Optional[str] = None) -> None:
+        """
+        Re-index changed paths from a snapshot directory; paths missing there are removed.
+        """
+        for path in changed_paths:
+            text = _read_source(os.path.join(root, path)) if self.is_indexed(path) else None
+            if text is None:
+                self.remove_file(path)
+            else:
+                self.add_file(path, text)
+        self.sha = sha or self.sha
+
+    @property
+    def files(self) -> int:
+        return len(self._by_path)
+
+    def lookup(self, query: str, limit: int = 10) -> List[SymbolMatch]:
+        """
+        Find where a function / class name, or the code that logged a message, lives.
+
+        A bare name returns its definitions, then the files using it. Any other text is
+        treated as a log line: string literals are ranked by the rarity of the words they
+        share with it, and literals whose template (placeholders as wildcards) matches the
+        line outright rank first. Names mentioned in the line add their definitions.
+        """
+        query = query.strip()
+        if IDENTIFIER.fullmatch(query) or re.fullmatch(r"[\w$.]+", query):
+            name = query.rsplit(".", 1)[-1]
+            matches = [SymbolMatch(path, line, "definition", name, 2.0) for path, line in self.definitions.get(name, ())]
+            matches += [SymbolMatch(path, line, "reference", name, 1.0) for path, line in self.identifiers.get(name, ())]
+            return matches[:limit]
+
+        words = {word.lower() for word in WORD.findall(query)} - STOP_WORDS
+        total = max(1, len(self.literals))
+        scores: Dict[int, float] = defaultdict(float)
+        for word in words:
+            # Copied, since update() may be re-indexing files of this index meanwhile
+            postings = tuple(self.literal_words.get(word, ()))
+            if postings:
+                idf = math.log(1 + total / len(postings))
+                for literal_id in postings:
+                    scores[literal_id] += idf
+
+        ranked = []
+        for literal_id, score in sorted(scores.items(), key=lambda item: -item[1])[:limit * 5]:
+            literal = self.literals.get(literal_id)
+            if literal is None:
+                continue
+            coverage = len(literal.words & words) / len(literal.words)
+            score *= coverage
+            if coverage == 1 and _template_regex(literal.text).search(query):
+                score *= 2
+            ranked.append(SymbolMatch(literal.path, literal.line, "literal", literal.text, round(score, 3)))
+
+        for name in set(IDENTIFIER.findall(query)):
+            for path, line in self.definitions.get(name, ())[:3]:
+                ranked.append(SymbolMatch(path, line, "definition", name, 1.0))
+
+        ranked.sort(key=lambda match: -match.score)
+        return ranked[:limit]
+
+
+def _read_source(local_path: str) -> Optional[str]:
+    if not SymbolIndex.is_indexed(local_path):
+        return None
+    try:
+        if os.path.getsize(local_path) > MAX_FILE_BYTES:
+            return None
+        with open(local_path, encoding="utf-8") as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+class SymbolIndexCache:
+    """
+    Latest SymbolIndex per repository. When the repository's head moves, the index of
+    the previous commit is updated with the files that changed instead of rebuilt.
+    """
+
+    def __init__(self, max_repos: int = 16):
+        self.max_repos = max_repos
+        self._lock = Lock()
+        self._indexes: Dict[Tuple[str, str], SymbolIndex] = {}
+        self._repo_locks: Dict[Tuple[str, str], Lock] = defaultdict(Lock)
+
+    def get(self, client, owner: str, repo: str) -> SymbolIndex:
+        """
+        Index of the repository's current head, from client.mirror's snapshot.
+        """
+        if client.mirror is None:
+            raise RuntimeError("The symbol index needs the repository mirror; set GITHUB_MIRROR_PATH.")
+        with self._lock:
+            repo_lock = self._repo_locks[(owner, repo)]
+        with repo_lock:
+            root = client.mirror.ensure(client, owner, repo)
+            sha = os.path.basename(root)
+            with self._lock:
+                index = self._indexes.get((owner, repo))
+            if index is not None and index.sha == sha:
+                return index
+
+            if index is None:
+                index = SymbolIndex.build(root, sha)
+            else:
+                changed = client.compare_commits(owner, repo, index.sha, sha)
+                if changed is None:
+                    index = SymbolIndex.build(root, sha)
+                else:
+                    index.update(root, changed, sha)
+
+            with self._lock:
+                self._indexes[(owner, repo)] = index
+                while len(self._indexes) > self.max_repos:
+                    del self._indexes[next(iter(self._indexes))]
+            return index
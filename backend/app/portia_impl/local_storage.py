@@ -0,0 +1,319 @@
+import time
+from collections import OrderedDict
+from threading import Condition, Thread
+from typing import Optional
+
+from portia import PlanRunState
+from portia.plan import Plan
+from portia.plan_run import PlanRun
+from portia.storage import InMemoryStorage, PlanRunListResponse
+
+from ..database import Base, SessionLocal, engine
+from ..models import StoredPlan, StoredPlanRun
+from .events import plan_run_events
+
+# Page size of get_plan_runs when answered locally
+PLAN_RUNS_PAGE_SIZE = 20
+
+# Tool calls are only queued, not stored locally; beyond this many the oldest are dropped
+MAX_PENDING_TOOL_CALLS = 1000
+
+
+class LocalFirstStorage:
+    """
+    Portia storage that keeps plans and plan runs in the application database and
+    writes them through to a remote storage (PortiaCloudStorage) in the background.
+
+    Saves return once the local row is committed; reads are local lookups, falling
+    back to the remote (and keeping a local copy) for ids saved elsewhere. One sync
+    thread pushes saves to the remote in order, keeping only the latest save of each
+    plan run that is still queued. Rows the remote has not acknowledged stay marked
+    unsynced and are pushed again by resync(), e.g. after a restart. Tool calls are
+    pushed too but not kept locally; while the remote is unreachable at most
+    max_pending_tool_calls of them wait, the newest.
+
+    Without a remote it is disk-only: nothing leaves the machine. Everything else Portia
+    stores (e.g. large tool outputs) goes to the remote, or without one to fallback: a
+    DiskFileStorage to keep it on disk, in memory by default.
+
+    With an EventBroker, every saved plan run is compared with its previous save and
+    the resulting progress events are published under the plan run's and the plan's id.
+    """
+
+    def __init__(
+        self,
+        remote=None,
+        session_factory=SessionLocal,
+        retry_interval: float = 5.0,
+        events=None,
+        fallback=None,
+        max_pending_tool_calls: int = MAX_PENDING_TOOL_CALLS,
+    ):
+        self.remote = remote
+        self.fallback = remote if remote is not None else fallback if fallback is not None else InMemoryStorage()
+        self.events = events
+        self.session_factory = session_factory
+        self.retry_interval = retry_interval
+        self.max_pending_tool_calls = max_pending_tool_calls
+        self._condition = Condition()
+        # (model, id) -> (row version, object) waiting to be pushed, oldest first
+        self._pending: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._pending_tool_calls = 0
+        # (model, id, version) of the save being pushed right now
+        self._in_flight = None
+        self._closed = False
+        self.local_reads = 0
+        self.remote_reads = 0
+        self.synced = 0
+        self.sync_failures = 0
+        self.tool_calls_dropped = 0
+        Base.metadata.create_all(bind=engine, tables=[StoredPlan.__table__, StoredPlanRun.__table__])
+        self._thread = None
+        if remote is not None:
+            self._thread = Thread(target=self._sync_loop, name="portia-storage-sync", daemon=True)
+            self._thread.start()
+
+    def _save(self, model, obj, synced: bool = False, **columns) -> Optional[str]:
+        """
+        Upsert obj locally (queueing it for the remote unless synced) and return the
+        data it replaced, if any.
+        """
+        previous = None
+        with self.session_factory() as db:
+            row = db.get(model, str(obj.id))
+            data = obj.model_dump_json()
+            if row is None:
+                version = 1
+                db.add(model(id=str(obj.id), data=data, version=version, synced=synced, updated_at=time.time(), **columns))
+            else:
+                previous = row.data
+                version = row.version + 1
+                row.data = data
+                row.version = version
+                row.synced = synced
+                row.updated_at = time.time()
+                for name, value in columns.items():
+                    setattr(row, name, value)
+            db.commit()
+        if not synced:
+            self._enqueue(model, obj, version)
+        return previous
+
+    def _load(self, model, object_id, parse):
+        with self.session_factory() as db:
+            row = db.get(model, str(object_id))
+            data = row.data if row is not None else None
+        if data is not None:
+            self.local_reads += 1
+            return parse(data)
+        return None
+
+    def save_plan(self, plan: Plan) -> None:
+        self._save(StoredPlan, plan)
+
+    def get_plan(self, plan_id) -> Plan:
+        plan = self._load(StoredPlan, plan_id, Plan.model_validate_json)
+        if plan is None:
+            if self.remote is None:
+                raise KeyError(f"Plan {plan_id} not found")
+            plan = self.remote.get_plan(plan_id)
+            self.remote_reads += 1
+            self._save(StoredPlan, plan, synced=True)
+        return plan
+
+    def save_plan_run(self, plan_run: PlanRun) -> None:
+        previous = self._save(StoredPlanRun, plan_run, plan_id=str(plan_run.plan_id), state=str(plan_run.state))
+        if self.events is not None:
+            self._publish(plan_run, previous)
+
+    def _publish(self, plan_run: PlanRun, previous: Optional[str]) -> None:
+        try:
+            plan = self._load(StoredPlan, plan_run.plan_id, Plan.model_validate_json)
+            events = plan_run_events(
+                PlanRun.model_validate_json(previous) if previous is not None else None,
+                plan_run,
+                plan.steps if plan is not None else None,
+            )
+            for event in events:
+                # Runs of a cached plan share its topic; the run id tells them apart
+                event = {"plan_run_id": str(plan_run.id), **event}
+                self.events.publish(str(plan_run.id), event)
+                self.events.publish(str(plan_run.plan_id), event)
+        except Exception as e:
+            # Progress events are best effort; the save itself went through
+            print(f"Publishing progress of {plan_run.id} failed: {e}")
+
+    def get_plan_run(self, plan_run_id) -> PlanRun:
+        plan_run = self._load(StoredPlanRun, plan_run_id, PlanRun.model_validate_json)
+        if plan_run is None:
+            if self.remote is None:
+                raise KeyError(f"Plan run {plan_run_id} not found")
+            plan_run = self.remote.get_plan_run(plan_run_id)
+            self.remote_reads += 1
+            self._save(StoredPlanRun, plan_run, synced=True, plan_id=str(plan_run.plan_id), state=str(plan_run.state))
+        return plan_run
+
+    def get_plan_runs(self, run_state: Optional[PlanRunState] = None, page: Optional[int] = None) -> PlanRunListResponse:
+        """
+        Plan runs known locally, most recently updated first.
+        """
+        page = page or 1
+        with self.session_factory() as db:
+            query = db.query(StoredPlanRun)
+            if run_state is not None:
+                query = query.filter(StoredPlanRun.state == str(run_state))
+            count = query.count()
+            rows = query.order_by(StoredPlanRun.updated_at.desc()).offset((page - 1) * PLAN_RUNS_PAGE_SIZE).limit(PLAN_RUNS_PAGE_SIZE).all()
+            results = [PlanRun.model_validate_json(row.data) for row in rows]
+        self.local_reads += 1
+        return PlanRunListResponse(
+            results=results,
+            count=count,
+            current_page=page,
+            total_pages=max(1, -(-count // PLAN_RUNS_PAGE_SIZE)),
+        )
+
+    def save_tool_call(self, tool_call) -> None:
+        if self.remote is not None:
+            self._enqueue("tool_call", tool_call)
+
+    def __getattr__(self, name):
+        # Anything else (e.g. large output storage) is left to the remote or the fallback
+        fallback = self.__dict__.get("fallback")
+        if fallback is None:
+            raise AttributeError(name)
+        return getattr(fallback, name)
+
+    def _enqueue(self, model, obj, version: Optional[int] = None) -> None:
+        """
+        Queue obj, saved locally as version of its row, for the remote.
+        """
+        if self.remote is None:
+            return
+        with self._condition:
+            # Tool calls are never coalesced: each one is a separate record
+            key = (model, str(obj.id) if model != "tool_call" else id(obj))
+            self._pending.pop(key, None)
+            self._pending[key] = (version, obj)
+            if model == "tool_call":
+                self._pending_tool_calls += 1
+                if self._pending_tool_calls > self.max_pending_tool_calls:
+                    oldest = next(key for key in self._pending if key[0] == "tool_call")
+                    del self._pending[oldest]
+                    self._pending_tool_calls -= 1
+                    self.tool_calls_dropped += 1
+            self._condition.notify_all()
+
+    def _push(self, model, obj) -> None:
+        if model == "tool_call":
+            self.remote.save_tool_call(obj)
+        elif model is StoredPlan:
+            self.remote.save_plan(obj)
+        else:
+            self.remote.save_plan_run(obj)
+
+    def _sync_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                (model, object_id), (version, obj) = self._pending.popitem(last=False)
+                if model == "tool_call":
+                    self._pending_tool_calls -= 1
+                self._in_flight = (model, object_id, version)
+
+            try:
+                self._push(model, obj)
+            except Exception as e:
+                self.sync_failures += 1
+                print(f"Sync of {object_id} to remote storage failed, retrying: {e}")
+                with self._condition:
+                    self._in_flight = None
+                    if self._closed:
+                        # Left unsynced in the database for the next resync()
+                        continue
+                    # Back to the front, so nothing saved after it (its plan runs) goes
+                    # first; a newer save queued meanwhile takes its place
+                    if model == "tool_call":
+                        self._pending_tool_calls += 1
+                    self._pending.setdefault((model, object_id), (version, obj))
+                    self._pending.move_to_end((model, object_id), last=False)
+                    self._condition.wait(self.retry_interval)
+                continue
+
+            self.synced += 1
+            if version is not None:
+                with self.session_factory() as db:
+                    # Only if no newer save landed while this one was in flight
+                    db.query(model).filter(model.id == object_id, model.version == version).update({"synced": True})
+                    db.commit()
+            with self._condition:
+                self._in_flight = None
+
+    def resync(self) -> int:
+        """
+        Queue every plan and plan run the remote has not acknowledged, unless already
+        queued or being pushed. Returns how many.
+        """
+        if self.remote is None:
+            return 0
+        with self.session_factory() as db:
+            rows = [
+                (model, row.id, row.data, row.version)
+                for model in (StoredPlan, StoredPlanRun)
+                for row in db.query(model).filter(model.synced.is_(False)).order_by(model.updated_at).all()
+            ]
+        queued = 0
+        for model, object_id, data, version in rows:
+            with self._condition:
+                if (model, object_id) in self._pending or self._in_flight == (model, object_id, version):
+                    continue
+            self._enqueue(model, (Plan if model is StoredPlan else PlanRun).model_validate_json(data), version)
+            queued += 1
+        return queued
+
+    def adopt(self, previous: "LocalFirstStorage") -> None:
+        """
+        Take over the saves the storage this one replaces still had queued. Its sync
+        thread is stopped, after the push it has in flight, so nothing is pushed twice.
+        """
+        with previous._condition:
+            pending, previous._pending = previous._pending, OrderedDict()
+            previous._pending_tool_calls = 0
+            previous._closed = True
+            previous._condition.notify_all()
+        if previous._thread is not None:
+            previous._thread.join()
+        if self.remote is None:
+            # Disk-only from now on: the rows stay local, unsynced
+            return
+        with self._condition:
+            pending.update(self._pending)
+            self._pending = pending
+            self._pending_tool_calls = sum(1 for key in pending if key[0] == "tool_call")
+            self._condition.notify_all()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Stop the sync thread once the queued saves are pushed (or timeout passes).
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "mode": "write-through" if self.remote is not None else "disk-only",
+            "local_reads": self.local_reads,
+            "remote_reads": self.remote_reads,
+            "synced": self.synced,
+            "sync_failures": self.sync_failures,
+            "tool_calls_dropped": self.tool_calls_dropped,
+            "pending": pending,
+        }
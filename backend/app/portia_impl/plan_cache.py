@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from portia.plan import Plan
+
+DEFAULT_PLAN_CACHE_PATH = ".plan_cache.json"
+
+# Config fields that change what the planner produces
+MODEL_CONFIG_FIELDS = ("llm_provider", "llm_model_name", "llm_model_temperature", "llm_model_seed")
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def tools_signature(tools) -> str:
+    """
+    Hash of a tool registry's tool ids, descriptions, argument and output schemas.
+    """
+    return _digest(sorted(
+        (tool.id, tool.name, tool.description, tool.args_schema.model_json_schema(), list(tool.output_schema))
+        for tool in tools.get_tools()
+    ))
+
+
+def model_signature(config) -> str:
+    return _digest({field: getattr(config, field, None) for field in MODEL_CONFIG_FIELDS})
+
+
+def storage_signature(plan_storage: Optional[str], api_key: Optional[str]) -> str:
+    """
+    Hash of where plans are stored: on disk, or the Portia Cloud account of api_key.
+    """
+    if plan_storage == "disk":
+        return _digest(["disk"])
+    return _digest(["cloud", api_key])
+
+
+class PlanCache:
+    """
+    Plans by the query, toolset, model and plan storage they were generated with.
+
+    Planning the same query against the same tools and model gives the same plan, so
+    it is only sent to the planner LLM once and the stored plan is handed out after.
+    Runs look the plan up by id, so a cached plan is only handed out while its storage
+    still has it; otherwise it is planned again. Entries made with another toolset are
+    dropped by prune(). The least recently used entries are evicted beyond max_entries.
+
+    Entries are kept in a JSON file (PLAN_CACHE_PATH, .plan_cache.json by default) so
+    they survive restarts; an empty path keeps them in memory only.
+    """
+
+    def __init__(self, max_entries: int = 100, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = os.getenv("PLAN_CACHE_PATH", DEFAULT_PLAN_CACHE_PATH) if path is None else path
+        self._lock = Lock()
+        self._key_locks: dict = {}
+        self._entries: "OrderedDict[str, dict]" = self._load()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Planner time the hits did not have to spend, going by what each plan first took
+        self.seconds_saved = 0.0
+
+    def _load(self) -> "OrderedDict[str, dict]":
+        if not self.path or not os.path.exists(self.path):
+            return OrderedDict()
+        try:
+            with open(self.path) as f:
+                return OrderedDict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return OrderedDict()
+
+    def _flush(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def key(query: str, tools: str, model: str, storage: str) -> str:
+        return _digest([query, tools, model, storage])
+
+    def get(self, key: str, storage=None) -> Optional[Plan]:
+        """
+        The cached plan, if any and, when storage is given, it can still load the plan.
+        """
+        if storage is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                return None
+            plan_id = entry["plan"].get("id")
+            try:
+                storage.get_plan(plan_id)
+            except Exception as e:
+                print(f"Cached plan {plan_id} is gone from storage, planning again: {e}")
+                self.discard(key)
+                return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry["seconds"]
+        return Plan.model_validate(entry["plan"])
+
+    def put(self, key: str, plan: Plan, tools: str, seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = {
+                "plan": json.loads(plan.model_dump_json()),
+                "tools": tools,
+                "seconds": round(seconds, 3),
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._flush()
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+                self._flush()
+
+    def plan(self, portia, query: str, tools: str, model: str, storage: str) -> Plan:
+        """
+        The cached plan for query, or portia.plan(query) stored for next time. Concurrent
+        misses for the same key wait for the one planner call instead of each making it.
+        """
+        key = self.key(query, tools, model, storage)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, Lock())
+        try:
+            with key_lock:
+                plan = self.get(key, portia.storage)
+                if plan is not None:
+                    return plan
+                with self._lock:
+                    self.misses += 1
+                start = time.monotonic()
+                plan = portia.plan(query)
+                self.put(key, plan, tools, time.monotonic() - start)
+                return plan
+        finally:
+            with self._lock:
+                # Callers still waiting hold the lock object; later ones find the plan cached
+                if self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+
+    def prune(self, tools: str) -> int:
+        """
+        Drop the plans made with any toolset other than tools. Returns how many.
+        """
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry["tools"] != tools]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            if stale:
+                self._flush()
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "seconds_saved": round(self.seconds_saved, 1),
+            }
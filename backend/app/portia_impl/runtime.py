@@ -0,0 +1,242 @@
+import os
+import time
+from threading import Lock
+from typing import Dict, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from portia import Config, ExecutionHooks, LLMModel, LLMProvider, Portia, StorageClass
+from portia.execution_hooks import BeforeStepExecutionOutcome
+from portia.plan import Plan
+from portia.storage import DiskFileStorage, PortiaCloudStorage
+
+from ..jobs import current_job
+from .aws_actions import AWSClient, AWSClientManager
+from .github_actions import GitHubClient, GitHubClientManager
+from .events import plan_events
+from .local_storage import LocalFirstStorage
+from .plan_cache import PlanCache, model_signature, storage_signature, tools_signature
+
+# Everything the runtime is built from; a change to any of them rebuilds it
+CREDENTIAL_VARIABLES = (
+    "OPENAI_API_KEY",
+    "PORTIA_API_KEY",
+    "GITHUB_TOKEN",
+    "GITHUB_USERNAME",
+    "AWS_ACCESS_KEY",
+    "AWS_SECRET",
+    "AWS_REGION",
+    "LOGS_BACKEND",
+    "PLAN_STORAGE",
+)
+
+# Where PLAN_STORAGE=disk keeps what Portia stores besides plans and plan runs
+DEFAULT_STORAGE_DIR = ".portia_storage"
+
+
+def stop_cancelled_job(plan, plan_run, step) -> BeforeStepExecutionOutcome:
+    """
+    Before every plan step: raise JobCancelled if the job running the plan was
+    cancelled or timed out, so the run stops at the step boundary.
+    """
+    job = current_job()
+    if job is not None:
+        job.check()
+    return BeforeStepExecutionOutcome.CONTINUE
+
+
+class RuntimeState(NamedTuple):
+    config: Config
+    portia: Portia
+    storage: LocalFirstStorage
+    github: GitHubClient
+    aws: AWSClient
+    model: str
+    plan_storage: str
+    credentials: Dict[str, Optional[str]]
+    built_at: float
+
+
+class PortiaRuntime:
+    """
+    Application-scoped Portia instance, storage and GitHub / AWS clients.
+
+    Built once (at FastAPI startup) instead of on every request. get() hands out the
+    current state and rebuilds it first when a credential variable changed. A rebuild
+    constructs the new state completely, clients included, before swapping it in and
+    installing its clients into GitHubClientManager / AWSClientManager, so a failed
+    rebuild leaves the old state and clients serving.
+
+    Plans go through a PlanCache keyed by the query, this toolset, the model and the
+    plan storage. Plans
+    and plan runs are stored locally first (LocalFirstStorage) and written through to
+    Portia Cloud, or with PLAN_STORAGE=disk kept on disk only.
+    """
+
+    def __init__(self, tools, plan_cache: Optional[PlanCache] = None):
+        self.tools = tools
+        self.tools_signature = tools_signature(tools)
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache()
+        self._lock = Lock()
+        self._state: Optional[RuntimeState] = None
+        self.started_at: Optional[float] = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def _credentials() -> Dict[str, Optional[str]]:
+        return {name: os.getenv(name) for name in CREDENTIAL_VARIABLES}
+
+    def _build(self, credentials: Dict[str, Optional[str]]) -> RuntimeState:
+        disk_only = credentials["PLAN_STORAGE"] == "disk"
+        config = Config.from_default(
+            llm_provider=LLMProvider.OPENAI,
+            llm_model_name=LLMModel.GPT_4_O,
+            anthropic_api_key=credentials["OPENAI_API_KEY"],
+            storage_class=StorageClass.MEMORY if disk_only else StorageClass.CLOUD
+        )
+        portia = Portia(config=config, tools=self.tools, execution_hooks=ExecutionHooks(before_step_execution=stop_cancelled_job))
+        remote = None if disk_only else PortiaCloudStorage(config=config)
+
+        # Built here, installed by _rebuild only once everything else built too
+        github = GitHubClientManager.create_client(credentials["GITHUB_TOKEN"], credentials["GITHUB_USERNAME"])
+        storage = None
+        try:
+            # So the new client's stores load what the current one has not written yet
+            AWSClientManager.save()
+            aws = AWSClient(
+                access_key=credentials["AWS_ACCESS_KEY"],
+                secret_key=credentials["AWS_SECRET"],
+                region=credentials["AWS_REGION"]
+            )
+            # Last, as it starts a sync thread; _rebuild queues the unsynced rows once
+            # the storage it replaces stopped pushing them
+            storage = LocalFirstStorage(
+                remote,
+                events=plan_events,
+                fallback=DiskFileStorage(storage_dir=config.storage_dir or DEFAULT_STORAGE_DIR) if disk_only else None,
+            )
+            # Portia builds its storage from the config; route it through the local tier
+            portia.storage = storage
+        except Exception:
+            if storage is not None:
+                storage.close(timeout=0)
+            github.session.close()
+            raise
+        return RuntimeState(
+            config,
+            portia,
+            storage,
+            github,
+            aws,
+            model_signature(config),
+            storage_signature(credentials["PLAN_STORAGE"], credentials["PORTIA_API_KEY"]),
+            credentials,
+            time.time(),
+        )
+
+    def _rebuild(self, credentials: Dict[str, Optional[str]]) -> RuntimeState:
+        try:
+            state = self._build(credentials)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        previous = self._state
+        if previous is not None:
+            self.reloads += 1
+            # Takes over its queued writes, so no row is pushed by both
+            state.storage.adopt(previous.storage)
+        try:
+            state.storage.resync()
+        except Exception as e:
+            # Still unsynced in the database; the next resync() picks them up
+            print(f"Queueing unsynced plans failed: {e}")
+        GitHubClientManager.install(state.github)
+        AWSClientManager.install(state.aws)
+        self._state = state
+        self.last_error = None
+        return state
+
+    def start(self) -> None:
+        """
+        Build the runtime. Failures are recorded for health() rather than raised, so the
+        API still starts without credentials; get() tries again.
+        """
+        self.started_at = time.time()
+        # Plans persisted by a build with other tools would call tools that changed
+        self.plan_cache.prune(self.tools_signature)
+        with self._lock:
+            try:
+                self._rebuild(self._credentials())
+            except Exception as e:
+                print(f"Portia runtime not started: {e}")
+
+    def get(self) -> RuntimeState:
+        """
+        The current state, (re)built first if there is none yet or credentials changed.
+        """
+        credentials = self._credentials()
+        state = self._state
+        if state is not None and state.credentials == credentials:
+            return state
+        with self._lock:
+            state = self._state
+            if state is not None and state.credentials == credentials:
+                return state
+            return self._rebuild(credentials)
+
+    def plan(self, query: str) -> Plan:
+        """
+        Plan query with the current Portia instance, reusing the cached plan if the
+        query, tools, model and plan storage are unchanged.
+        """
+        state = self.get()
+        return self.plan_cache.plan(state.portia, query, self.tools_signature, state.model, state.plan_storage)
+
+    def reload(self) -> RuntimeState:
+        """
+        Re-read .env (its values win over the environment) and rebuild the runtime.
+        """
+        load_dotenv(override=True)
+        with self._lock:
+            return self._rebuild(self._credentials())
+
+    def health(self, deep: bool = False) -> dict:
+        """
+        Runtime status. With deep=True, GitHub and CloudWatch Logs are also called once
+        each to check the credentials still work.
+        """
+        state = self._state
+        if state is None:
+            status = "down"
+        else:
+            # A failed reload leaves the previous state serving
+            status = "degraded" if self.last_error else "ok"
+        health = {
+            "status": status,
+            "started_at": self.started_at,
+            "built_at": state.built_at if state is not None else None,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "credentials_changed": state is not None and state.credentials != self._credentials(),
+            "tools": [tool.id for tool in self.tools.get_tools()],
+            "plan_cache": self.plan_cache.stats(),
+            "storage": state.storage.stats() if state is not None else None,
+        }
+        if deep and state is not None:
+            health["checks"] = checks = {}
+            try:
+                github = state.github
+                # /rate_limit does not count against the rate limit
+                response = github.session.get(f"{github.base_url}/rate_limit", timeout=github.timeout)
+                response.raise_for_status()
+                checks["github"] = "ok"
+            except Exception as e:
+                checks["github"] = f"{type(e).__name__}: {e}"
+            try:
+                state.aws.client.describe_log_groups(limit=1)
+                checks["aws"] = "ok"
+            except Exception as e:
+                checks["aws"] = f"{type(e).__name__}: {e}"
+            if any(result != "ok" for result in checks.values()):
+                health["status"] = "degraded"
+        return health
@@ -0,0 +1,132 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class StackFrame(NamedTuple):
+    path: str
+    line: int
+    function: Optional[str]
+    language: str
+    is_library: bool
+
+
+# File "/app/handlers/pay.py", line 12, in charge
+PYTHON_FRAME = re.compile(r'File "(?P<path>[^"]+)", line (?P<line>\d+)(?:, in (?P<function>\S+))?')
+
+# at charge (/app/src/pay.js:12:5)   or   at /app/src/pay.js:12:5
+NODE_FRAME = re.compile(
+    r"\bat (?:(?:async )?(?P<function>[^\s(]+) \()?(?:file://)?(?P<path>[^\s():]+\.(?:[cm]?js|jsx|tsx?)):(?P<line>\d+):\d+\)?"
+)
+
+# at com.shop.Cart.total(Cart.java:42)
+JAVA_FRAME = re.compile(r"\bat (?P<function>[\w$.<>]+)\((?P<file>[\w$-]+\.(?:java|kt|scala|groovy)):(?P<line>\d+)\)")
+
+LIBRARY_MARKERS = (
+    "site-packages/",
+    "dist-packages/",
+    "/lib/python",
+    "<frozen ",
+    "<string>",
+    "node_modules/",
+    "node:internal",
+    "internal/",
+)
+
+LIBRARY_JAVA_PACKAGES = ("java.", "javax.", "jdk.", "sun.", "kotlin.", "scala.", "org.springframework.", "org.apache.")
+
+
+def _python_frames(text: str) -> List[StackFrame]:
+    frames = [
+        StackFrame(m["path"], int(m["line"]), m["function"], "python", _is_library_path(m["path"]))
+        for m in PYTHON_FRAME.finditer(text)
+    ]
+    # Python prints the innermost frame last
+    return frames[::-1]
+
+
+def _node_frames(text: str) -> List[StackFrame]:
+    return [
+        StackFrame(m["path"], int(m["line"]), m["function"], "node", _is_library_path(m["path"]))
+        for m in NODE_FRAME.finditer(text)
+    ]
+
+
+def _java_frames(text: str) -> List[StackFrame]:
+    frames = []
+    for m in JAVA_FRAME.finditer(text):
+        function = m["function"]
+        class_name = function.rsplit(".", 1)[0].split("$", 1)[0]
+        package = class_name.rsplit(".", 1)[0] if "." in class_name else ""
+        path = f"{package.replace('.', '/')}/{m['file']}" if package else m["file"]
+        frames.append(StackFrame(path, int(m["line"]), function, "java", function.startswith(LIBRARY_JAVA_PACKAGES)))
+    return frames
+
+
+def _is_library_path(path: str) -> bool:
+    return any(marker in path for marker in LIBRARY_MARKERS)
+
+
+def extract_frames(text: str) -> List[StackFrame]:
+    """
+    Extract stack frames from Python, Node and Java stack traces in a log message.
+
+    Frames are returned innermost first, which is the order a culprit should be looked
+    for in.
+    """
+    frames = []
+    if "File \"" in text:
+        frames.extend(_python_frames(text))
+    if "at " in text:
+        frames.extend(_java_frames(text))
+        frames.extend(_node_frames(text))
+    return frames
+
+
+def culprit_frames(messages: Iterable[str]) -> List[StackFrame]:
+    """
+    Application frames (library frames removed) from a batch of error messages,
+    innermost first and without duplicates.
+    """
+    seen = set()
+    frames = []
+    for message in messages:
+        for frame in extract_frames(message):
+            key = (frame.path, frame.line)
+            if frame.is_library or key in seen:
+                continue
+            seen.add(key)
+            frames.append(frame)
+    return frames
+
+
+def candidate_repo_paths(frame_path: str) -> List[str]:
+    """
+    Repository-relative candidates for a runtime path, longest first.
+
+    "/var/task/app/handlers/pay.py" -> ["var/task/app/handlers/pay.py",
+    "task/app/handlers/pay.py", "app/handlers/pay.py", "handlers/pay.py", "pay.py"]
+    """
+    parts = [part for part in frame_path.replace("\\", "/").split("/") if part and part != "."]
+    return ["/".join(parts[i:]) for i in range(len(parts))]
+
+
+def resolve_repo_path(frame_path: str, repo_paths: Iterable[str], by_basename: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
+    """
+    Map a runtime path to the repository path sharing its longest suffix.
+
+    by_basename (basename -> paths, as kept by RepoPathIndex) narrows each suffix
+    lookup to the files with the same name instead of scanning every path.
+    """
+    if not isinstance(repo_paths, (set, frozenset)):
+        repo_paths = set(repo_paths)
+    for candidate in candidate_repo_paths(frame_path):
+        if candidate in repo_paths:
+            return candidate
+        if by_basename is not None:
+            pool = by_basename.get(candidate.rsplit("/", 1)[-1], ())
+        else:
+            pool = repo_paths
+        matches = sorted(path for path in pool if path.endswith("/" + candidate))
+        if matches:
+            return matches[0]
+    return None
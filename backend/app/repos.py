@@ -1,19 +1,25 @@
-import time
+import json
 import requests
 import os
 import re
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from functools import wraps
 import asyncio
 
 from .database import get_db
-from .schemas import ContinuePlanResponse, CreatePlanResponse, RunPlanResponse, PlanStatusResponse, Repo, Repos
+from .schemas import ContinuePlanResponse, CreatePlanResponse, JobResponse, JobsResponse, JobSubmittedResponse, RunPlanResponse, PlanStatusResponse, Repo, Repos
 from .models import Repo as RepoModel
+from .jobs import CANCELLED, SUCCEEDED, TIMED_OUT, JobContext, JobQueueFull, job_runner
 
 from .portia_impl import create_plan, run_plan, resume_run
+from .portia_impl.main import runtime
+from .portia_impl.events import plan_events
+from .portia_impl.github_actions.github_client_manager import GitHubClientManager
+from .portia_impl.github_actions.rate_limiter import DEFAULT_SCHEDULER
 
 router = APIRouter()
 
@@ -32,6 +38,11 @@ class AddReposRequest(BaseModel):
     repos: List[AddRepoRequest]
 
 
+class ImportReposRequest(BaseModel):
+    username: Optional[str] = None
+    org: Optional[str] = None
+
+
 class CreatePlanRequest(BaseModel):
     repo_id: str
     full_name: str
@@ -47,100 +58,246 @@ class ContinuePlanRequest(BaseModel):
 
 
 def log_operation(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        print(f"Entering {func.__name__}")
-        result = (
-            await func(*args, **kwargs)
-            if asyncio.iscoroutinefunction(func)
-            else func(*args, **kwargs)
-        )
+    def log_exit(result):
         # Convert result to string safely, handling potential circular references
         result_str = str(result) if result else "None"
         print(f"Exiting {func.__name__} with result: {result_str}")
         return result
 
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            print(f"Entering {func.__name__}")
+            return log_exit(await func(*args, **kwargs))
+    else:
+        # Kept sync, so FastAPI still runs blocking endpoints in its threadpool
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            print(f"Entering {func.__name__}")
+            return log_exit(func(*args, **kwargs))
+
     return wrapper
 
 
 ###########
 # ANALYZE #
 ###########
-# TODO - Implement AI Agent
-@router.post("/createplan", response_model=CreatePlanResponse)
-@log_operation
-async def createplan(request: CreatePlanRequest):
+# Planning and running plans take minutes, so they run as jobs on job_runner's worker
+# pool instead of on the event loop. The handlers below do the work of each endpoint.
+def create_plan_job(payload: dict, job: JobContext) -> dict:
+    job.progress("Generating the plan")
     plan = create_plan()
     print(plan)
 
     match = re.search(r"UUID\('([a-f0-9\-]{36})'\)", str(plan))
     plan_id = "plan-" + match.group(1)
-    
-    response = CreatePlanResponse(
-        plan_id=plan_id
-    )
 
-    return response
+    return CreatePlanResponse(plan_id=plan_id).model_dump()
 
 
-@router.post("/runplan", response_model=RunPlanResponse)
-@log_operation
-async def runplan(request: RunPlanRequest):
-    plan_id = request.plan_id
+def run_plan_job(payload: dict, job: JobContext) -> dict:
+    plan_id = payload["plan_id"]
 
+    job.progress(f"Running {plan_id}")
     plan_result = run_plan(plan_id)
     print(f"plan_result: {plan_result}")
 
     plan_run_id = re.search(r"plan_run_id=PlanRunUUID\(uuid=UUID\('([0-9a-f-]+)'\)\)", str(plan_result)).group(1)
 
-    response = RunPlanResponse(
+    return RunPlanResponse(
         plan_run_id=plan_run_id,
         user_guidance=plan_result.user_guidance,
         options=plan_result.options
-    )
+    ).model_dump()
+
+
+def continue_plan_job(payload: dict, job: JobContext) -> dict:
+    job.progress(f"Resuming plan run {payload['plan_run_id']} with {payload['option']}")
+    res = resume_run(payload["plan_run_id"], payload["option"])
+
+    return ContinuePlanResponse(output=str(res)).model_dump()
+
+
+job_runner.register("createplan", create_plan_job)
+job_runner.register("runplan", run_plan_job)
+job_runner.register("continueplan", continue_plan_job)
 
-    return response
+
+def submit_job(kind: str, payload: dict, timeout: Optional[float] = None) -> str:
+    try:
+        return job_runner.submit(kind, payload, timeout)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many jobs, try again later ({e})", headers={"Retry-After": "30"})
+
+
+async def run_job(kind: str, payload: dict) -> dict:
+    """
+    Submit a job and wait for its result without blocking the event loop.
+    """
+    job = await job_runner.wait(submit_job(kind, payload))
+    if job["status"] != SUCCEEDED:
+        status_code = {TIMED_OUT: 504, CANCELLED: 409}.get(job["status"], 500)
+        raise HTTPException(status_code=status_code, detail=f"Job {job['job_id']} {job['status']}: {job['error'] or ''}")
+    return job["result"]
+
+
+# These wait for the result, as the frontend expects; /jobs/... return a job id at once
+@router.post("/createplan", response_model=CreatePlanResponse)
+@log_operation
+async def createplan(request: CreatePlanRequest):
+    return CreatePlanResponse(**await run_job("createplan", request.model_dump()))
+
+
+@router.post("/runplan", response_model=RunPlanResponse)
+@log_operation
+async def runplan(request: RunPlanRequest):
+    return RunPlanResponse(**await run_job("runplan", request.model_dump()))
 
 
 @router.post("/continueplan", response_model=ContinuePlanResponse)
 @log_operation
 async def continueplan(request: ContinuePlanRequest):
-    res = resume_run(request.plan_run_id, request.option)
+    return ContinuePlanResponse(**await run_job("continueplan", request.model_dump()))
 
-    response = ContinuePlanResponse(
-        output=str(res)
-    )
 
-    return response
+@router.post("/jobs/createplan", response_model=JobSubmittedResponse, status_code=202)
+def submit_createplan(request: CreatePlanRequest, timeout: Optional[float] = None):
+    return JobSubmittedResponse(job_id=submit_job("createplan", request.model_dump(), timeout), status="queued")
+
+
+@router.post("/jobs/runplan", response_model=JobSubmittedResponse, status_code=202)
+def submit_runplan(request: RunPlanRequest, timeout: Optional[float] = None):
+    return JobSubmittedResponse(job_id=submit_job("runplan", request.model_dump(), timeout), status="queued")
+
+
+@router.post("/jobs/continueplan", response_model=JobSubmittedResponse, status_code=202)
+def submit_continueplan(request: ContinuePlanRequest, timeout: Optional[float] = None):
+    return JobSubmittedResponse(job_id=submit_job("continueplan", request.model_dump(), timeout), status="queued")
+
+
+@router.get("/jobs", response_model=JobsResponse)
+def list_jobs(status: Optional[str] = None, limit: int = 50):
+    return JobsResponse(jobs=job_runner.list(status, limit))
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """
+    Status, progress and (once succeeded) the result of a job.
+    """
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(job_id: str):
+    if job_runner.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job_runner.cancel(job_id)
+    return job_runner.get(job_id)
 
 
 @router.get("/getplanstatus/{plan_id}", response_model=PlanStatusResponse)
 @log_operation
 def get_plan_status(plan_id: str):
-    
+    """
+    The plan's steps and the progress events of its runs so far, from local storage.
+    Follow /plans/{plan_id}/events to get the progress as it happens instead.
+    """
+    plan_id = _prefixed(plan_id, "plan-")
     try:
-        # Use environment variable or securely stored key
-        api_key = os.getenv("PORTIA_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="Portia API key not configured")
+        plan = runtime.get().storage.get_plan(plan_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return PlanStatusResponse(output=str(plan.steps), events=plan_events.recent(plan_id))
+
 
-        portia_url = f"https://api.portialabs.ai/api/v0/plans/{plan_id}"
+def _prefixed(object_id: str, prefix: str) -> str:
+    # Responses hand out both "plan-<uuid>" and bare uuids
+    return object_id if object_id.startswith(prefix) else prefix + object_id
 
-        headers = {
-            "Authorization": f"Api-Key {api_key}",
-            "Accept": "application/json",
-        }
 
-        time.sleep(10)
-        response = requests.get(portia_url, headers=headers)
-        print(f"Porta get plan status response: {response['steps']}")
+async def _event_stream(request: Request, topic: str, last_event_id: Optional[int], until_finished: bool):
+    """
+    Server-Sent Events of a topic: kept events after last_event_id, then live ones,
+    with a keep-alive comment every 15 seconds of silence.
+    """
+    subscription = plan_events.subscribe(topic, last_event_id or 0)
+    try:
+        # An overflowed subscriber ends the stream; the client reconnects with Last-Event-ID
+        while not subscription.overflowed and not await request.is_disconnected():
+            event = await subscription.get(timeout=15)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+            if until_finished and event["type"] == "run_finished":
+                break
+    finally:
+        subscription.close()
 
-        res = PlanStatusResponse(output=str(response['steps']))
 
-        return res
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
+
+@router.get("/plans/{plan_id}/events")
+async def stream_plan_events(plan_id: str, request: Request, last_event_id: Optional[int] = Header(None)):
+    """
+    Live progress of every run of a plan (step started / completed, tool output,
+    clarification, run state) as Server-Sent Events, starting before runplan returns.
+    """
+    return _sse_response(_event_stream(request, _prefixed(plan_id, "plan-"), last_event_id, until_finished=False))
+
+
+@router.get("/planruns/{plan_run_id}/events")
+async def stream_plan_run_events(plan_run_id: str, request: Request, last_event_id: Optional[int] = Header(None)):
+    """
+    Live progress of one plan run as Server-Sent Events; the stream ends when it finishes.
+    """
+    return _sse_response(_event_stream(request, _prefixed(plan_run_id, "prun-"), last_event_id, until_finished=True))
+
+
+@router.get("/github/ratelimit", response_model=dict)
+def get_github_rate_limit():
+    """
+    Remaining GitHub API budget, in-flight and queued requests per token.
+    """
+    return DEFAULT_SCHEDULER.budget()
+
+
+@router.get("/runtime/health", response_model=dict)
+def get_runtime_health(deep: bool = False):
+    """
+    State of the shared Portia runtime; deep=true also checks the GitHub and AWS credentials.
+    """
+    return runtime.health(deep)
+
+
+@router.post("/runtime/reload", response_model=dict)
+def reload_runtime():
+    """
+    Rebuild the Portia runtime from the current .env, e.g. after rotating credentials.
+    """
+    try:
+        runtime.reload()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Reload failed, the previous runtime is still serving: {e}")
+    return runtime.health()
+
+
+@router.delete("/runtime/plancache", response_model=dict)
+def clear_plan_cache():
+    """
+    Forget every cached plan, so the next createplan asks the planner again.
+    """
+    runtime.plan_cache.clear()
+    return runtime.plan_cache.stats()
 
 
 #########
@@ -195,3 +352,40 @@ async def add_repos(request: AddReposRequest, db: Session = Depends(get_db)):
     db.commit()
 
     return {"message": "Repos upserted successfully"}
+
+
+@router.post("/import", response_model=dict)
+@log_operation
+def import_repos(request: ImportReposRequest, db: Session = Depends(get_db)):
+    """
+    Upsert every repository of a GitHub user or organization, page by page as the
+    pages arrive.
+    """
+    try:
+        client = GitHubClientManager.get_client()
+    except RuntimeError:
+        GitHubClientManager.initialize(os.getenv("GITHUB_TOKEN"), os.getenv("GITHUB_USERNAME"))
+        client = GitHubClientManager.get_client()
+
+    imported = 0
+    try:
+        for repos in client.iter_repository_pages(request.username, request.org):
+            for repo in repos:
+                repo_id = str(repo["id"])
+                existing_repo = db.get(RepoModel, repo_id)
+                if existing_repo:
+                    existing_repo.username = repo["owner"]["login"]
+                    existing_repo.full_name = repo["full_name"]
+                else:
+                    db.add(RepoModel(id=repo_id, username=repo["owner"]["login"], full_name=repo["full_name"]))
+            imported += len(repos)
+            # Commit once per page so a long import is visible (and kept) as it progresses
+            db.commit()
+    except requests.HTTPError as e:
+        db.rollback()
+        raise HTTPException(status_code=502, detail=f"GitHub request failed: {e}")
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"message": "Repos imported successfully", "count": imported}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Any, List
+from typing import Any, List, Optional
 from portia import Plan
 
 
@@ -25,3 +25,22 @@ class ContinuePlanResponse(BaseModel):
 
 class PlanStatusResponse(BaseModel):
     output: str
+    events: List[Any] = []
+
+class JobSubmittedResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    progress: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class JobsResponse(BaseModel):
+    jobs: List[JobResponse]
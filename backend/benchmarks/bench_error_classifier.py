@@ -0,0 +1,64 @@
+"""
+Micro-benchmark for the log error classifier.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_error_classifier --events 500000 --error-ratio 0.01
+"""
+import argparse
+import json
+import random
+import time
+
+from app.portia_impl.aws_actions.error_classifier import ErrorClassifier
+
+INFO_LINES = [
+    "INFO  request_id={rid} GET /api/users/{n} 200 {ms}ms",
+    "DEBUG cache hit for key user:{n}",
+    "INFO  Processed batch {n}: 0 errors, {ms} records",
+    "INFO  worker-{n} heartbeat ok",
+]
+ERROR_LINES = [
+    "ERROR request_id={rid} failed to charge card {n}",
+    "Traceback (most recent call last):\n  File \"/app/handlers/pay.py\", line {n}, in charge\nValueError: bad amount",
+    "java.lang.NullPointerException: null\n\tat com.shop.Cart.total(Cart.java:{n})",
+    "panic: runtime error: index out of range [{n}]",
+]
+
+
+def generate_corpus(events: int, error_ratio: float, json_ratio: float, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(events):
+        is_error = rng.random() < error_ratio
+        template = rng.choice(ERROR_LINES if is_error else INFO_LINES)
+        line = template.format(rid=f"{rng.getrandbits(64):016x}", n=i, ms=rng.randint(1, 900))
+        if rng.random() < json_ratio:
+            line = json.dumps({"level": "error" if is_error else "info", "msg": line, "ts": i})
+        corpus.append(line)
+    return corpus
+
+
+def bench(name: str, classify, corpus: list) -> None:
+    start = time.perf_counter()
+    matches = sum(1 for message in corpus if classify(message))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {len(corpus) / elapsed:>12,.0f} events/s  {matches:>8} matches  {elapsed:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--error-ratio", type=float, default=0.01)
+    parser.add_argument("--json-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.events, args.error_ratio, args.json_ratio)
+    classifier = ErrorClassifier()
+
+    bench("substring baseline", lambda message: "error" in message.lower(), corpus)
+    bench("compiled classifier", classifier.classify, corpus)
+
+
+if __name__ == "__main__":
+    main()
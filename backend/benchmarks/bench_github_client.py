@@ -0,0 +1,52 @@
+"""
+Latency of repeated GitHub API calls: a new connection per call (module-level
+requests.get, as GitHubClient used to do) against GitHubClient's pooled session.
+
+/rate_limit is queried by default because it does not count against the rate limit.
+Run from the backend directory:
+
+    GITHUB_TOKEN=... python -m benchmarks.bench_github_client --calls 50
+    python -m benchmarks.bench_github_client --path /repos/OWNER/REPO/contents/README.md
+"""
+import argparse
+import os
+import statistics
+import time
+
+import requests
+
+from app.portia_impl.github_actions.github_client import GitHubClient
+
+
+def bench(name: str, get, url: str, calls: int) -> None:
+    latencies_ms = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        get(url).raise_for_status()
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+    latencies_ms.sort()
+    p95 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]
+    print(
+        f"{name:<18} mean {statistics.mean(latencies_ms):>7.1f}ms  p50 {statistics.median(latencies_ms):>7.1f}ms  "
+        f"p95 {p95:>7.1f}ms  max {latencies_ms[-1]:>7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--path", default="/rate_limit", help="API path to request")
+    parser.add_argument("--base-url", default="https://api.github.com")
+    args = parser.parse_args()
+
+    client = GitHubClient(os.getenv("GITHUB_TOKEN", ""), os.getenv("GITHUB_USERNAME", ""))
+    if not client.token:
+        del client.session.headers["Authorization"]
+    url = args.base_url.rstrip("/") + args.path
+
+    bench("new connection", lambda u: requests.get(u, headers=client.session.headers, timeout=client.timeout), url, args.calls)
+    bench("pooled session", lambda u: client.session.get(u, timeout=client.timeout), url, args.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Fetching N files of a repository one after another with GitHubClient.read_file
+against AsyncGitHubClient.read_files, which fetches them concurrently.
+
+Every file is requested with a cold cache in both runs. Run from the backend directory:
+
+    GITHUB_TOKEN=... python -m benchmarks.bench_github_read_files --repo OWNER/REPO --files 20
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from app.portia_impl.github_actions.async_github_client import AsyncGitHubClient
+from app.portia_impl.github_actions.github_client import GitHubClient
+from app.portia_impl.github_actions.http_cache import ConditionalCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", required=True, help="OWNER/REPO to read files from")
+    parser.add_argument("--files", type=int, default=20, help="Number of files to fetch")
+    parser.add_argument("--extension", default="", help="Only pick files with this extension, e.g. .py")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", default="https://api.github.com")
+    args = parser.parse_args()
+
+    owner, repo = args.repo.split("/", 1)
+    token, username = os.getenv("GITHUB_TOKEN", ""), os.getenv("GITHUB_USERNAME", "")
+
+    client = GitHubClient(token, username, cache=ConditionalCache(path=""))
+    client.base_url = args.base_url
+    index = client.get_path_index(owner, repo)
+    paths = index.find_by_extension(args.extension) if args.extension else index.list_directory()
+    paths = paths[:args.files]
+    print(f"{len(paths)} files from {args.repo}")
+
+    start = time.perf_counter()
+    for path in paths:
+        client.read_file(owner, repo, path)
+    sequential = time.perf_counter() - start
+    print(f"sequential          {sequential:>7.2f}s  {sequential / len(paths) * 1000:>7.1f}ms/file")
+
+    async def read_concurrently():
+        async with AsyncGitHubClient(token, username, cache=ConditionalCache(path="")) as async_client:
+            async_client.base_url = args.base_url
+            return await async_client.read_files(owner, repo, paths, args.concurrency)
+
+    start = time.perf_counter()
+    contents = asyncio.run(read_concurrently())
+    concurrent = time.perf_counter() - start
+    failed = sum(content is None for content in contents.values())
+    print(f"concurrent (x{args.concurrency:<2})    {concurrent:>7.2f}s  {concurrent / len(paths) * 1000:>7.1f}ms/file  ({failed} unreadable)")
+    print(f"speedup             {sequential / concurrent:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Indexing throughput and query latency of the symbol index over a source tree.
+
+Run from the backend directory against any checkout or mirrored snapshot:
+
+    python -m benchmarks.bench_symbol_index --path /path/to/repo --queries 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.portia_impl.github_actions.symbol_index import PLACEHOLDER, SymbolIndex
+
+
+def sample_queries(index: SymbolIndex, count: int, seed: int = 7) -> list:
+    """
+    Half function / class names, half log lines rendered from indexed string literals
+    with their placeholders filled in.
+    """
+    rng = random.Random(seed)
+    names = list(index.definitions)
+    literals = [literal.text for literal in index.literals.values() if len(literal.words) >= 3]
+    queries = []
+    for i in range(count):
+        if i % 2 and literals:
+            queries.append(PLACEHOLDER.sub(lambda _: str(rng.randint(1, 9999)), rng.choice(literals)))
+        elif names:
+            queries.append(rng.choice(names))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", required=True, help="Directory to index")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--changed", type=int, default=20, help="Files to re-index in the incremental update run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SymbolIndex.build(args.path)
+    elapsed = time.perf_counter() - start
+    if not index.files:
+        parser.error(f"No indexable source files under {args.path}")
+    megabytes = index.indexed_bytes / 1024 ** 2
+    print(f"build       {index.files:,} files, {megabytes:.1f} MB in {elapsed:.2f}s  "
+          f"({index.files / elapsed:,.0f} files/s, {megabytes / elapsed:.1f} MB/s)")
+    print(f"            {len(index.definitions):,} definitions, {len(index.identifiers):,} identifiers, {len(index.literals):,} literals")
+
+    changed = random.Random(7).sample(sorted(index._by_path), min(args.changed, index.files))
+    start = time.perf_counter()
+    index.update(args.path, changed)
+    elapsed = time.perf_counter() - start
+    print(f"update      {len(changed)} files in {elapsed * 1000:.1f}ms")
+
+    queries = sample_queries(index, args.queries)
+    latencies_us = []
+    for query in queries:
+        start = time.perf_counter()
+        index.lookup(query)
+        latencies_us.append((time.perf_counter() - start) * 1e6)
+    latencies_us.sort()
+    p95 = latencies_us[int(len(latencies_us) * 0.95)]
+    print(f"lookup      {len(queries):,} queries  p50 {statistics.median(latencies_us):,.0f}us  p95 {p95:,.0f}us  max {latencies_us[-1]:,.0f}us")
+
+
+if __name__ == "__main__":
+    main()
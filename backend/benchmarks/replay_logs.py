@@ -0,0 +1,125 @@
+"""
+Load test for the log watcher against the local CloudWatch Logs stand-in.
+
+Events are generated (or replayed from recorded files) at a target rate, the watcher
+polls them exactly as it would poll CloudWatch, and the consumer side measures how many
+events per second were fetched and how long errors took from being written to leaving
+the watcher's queue.
+
+Run from the backend directory:
+
+    python -m benchmarks.replay_logs --eps 5000 --error-ratio 0.01 --duration 30
+    python -m benchmarks.replay_logs --source recorded_logs/ --eps 2000 --mode tail
+"""
+import argparse
+import json
+import queue
+import time
+
+from app.portia_impl.aws_actions.aws_client import AWSClient
+from app.portia_impl.aws_actions.fake_logs import FakeLogsClient
+from app.portia_impl.aws_actions.fingerprint import SignatureStore
+from app.portia_impl.aws_actions.log_checkpoints import LogCheckpointStore
+from app.portia_impl.aws_actions.log_watcher import LogWatcher
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def build_logs_client(args) -> FakeLogsClient:
+    kwargs = {"events_per_second": args.eps, "error_ratio": args.error_ratio, "seed": args.seed}
+    if args.source:
+        return FakeLogsClient.from_path(args.source, replay=True, **kwargs)
+    groups = {
+        f"/replay/group-{g}": [f"stream-{s}" for s in range(args.streams)]
+        for g in range(args.groups)
+    }
+    return FakeLogsClient(groups, **kwargs)
+
+
+def run(args) -> dict:
+    logs_client = build_logs_client(args)
+    client = AWSClient(
+        checkpoint_store=LogCheckpointStore(path=""),
+        signature_store=SignatureStore(path=""),
+        logs_client=logs_client,
+    )
+    watcher = LogWatcher(
+        client,
+        poll_interval=args.poll_interval,
+        max_poll_interval=args.poll_interval * 4,
+        max_workers=args.workers,
+        discovery_interval=5.0,
+        mode=args.mode,
+        overflow=args.overflow,
+    )
+
+    latencies_ms = []
+    watcher.start()
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < args.duration:
+            try:
+                event = watcher.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            latencies_ms.append(time.time() * 1000 - event.timestamp)
+    finally:
+        elapsed = time.monotonic() - start
+        watcher.stop()
+
+    stats = watcher.stats()
+    return {
+        "mode": args.mode,
+        "target_eps": args.eps,
+        "duration_s": round(elapsed, 1),
+        "fetched_eps": round(stats["events_fetched"] / elapsed, 1),
+        "errors_received": len(latencies_ms),
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 1),
+            "p95": round(percentile(latencies_ms, 95), 1),
+            "p99": round(percentile(latencies_ms, 99), 1),
+            "max": round(max(latencies_ms, default=0.0), 1),
+        },
+        "watcher": stats,
+        "api_calls": logs_client.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eps", type=float, default=1000, help="Events per second written across all streams")
+    parser.add_argument("--error-ratio", type=float, default=0.01)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--groups", type=int, default=2)
+    parser.add_argument("--streams", type=int, default=4, help="Streams per group")
+    parser.add_argument("--source", help="Directory of recorded logs to replay instead of synthetic events")
+    parser.add_argument("--mode", choices=("filter", "tail"), default="filter")
+    parser.add_argument("--overflow", choices=("block", "drop_oldest"), default="block")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    latency = report["latency_ms"]
+    print(f"mode={report['mode']} target={report['target_eps']:,.0f} ev/s duration={report['duration_s']}s")
+    # In filter mode only events matching the filter pattern leave the backend
+    print(f"fetched   {report['fetched_eps']:>12,.0f} events/s")
+    print(f"errors    {report['errors_received']:>12,} received")
+    print(f"latency   p50 {latency['p50']:.0f}ms  p95 {latency['p95']:.0f}ms  p99 {latency['p99']:.0f}ms  max {latency['max']:.0f}ms")
+    print(f"queue     {report['watcher']['queue']}")
+    print(f"api calls {report['api_calls']}")
+
+
+if __name__ == "__main__":
+    main()